@@ -1,7 +1,18 @@
-from flask import Flask, request, jsonify
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+import hmac
+import json
 import logging
+import time
 from common import chain_singleton
-from initialize import initialize_resources, chat_manager
+from common.batch import iter_batch_answers
+from common.config import ADMIN_API_TOKEN, BATCH_MAX_QUESTIONS
+from common.chat_history_manager import DEFAULT_SESSION_ID
+from initialize import initialize_resources, conversation, index_refresher
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -19,7 +30,8 @@ def ask_question():
     """
     Endpoint to process a user's question.
     
-    Expects JSON payload with key 'question'. Returns the answer in JSON format.
+    Expects JSON payload with key 'question' and an optional 'session_id' selecting the
+    conversation whose history is given to the LLM. Returns the answer in JSON format.
     """
     data = request.get_json(silent=True)  # Prevents throwing an exception on invalid JSON
     if not data or "question" not in data:
@@ -29,19 +41,13 @@ def ask_question():
     user_question = data["question"].strip()
     if not user_question:
         return jsonify({"error": "Question cannot be empty"}), 400
-
-    # Load chat history safely
-    chat_history = []
-    try:
-        chat_history = chat_manager.load_chat_history()
-    except Exception as e:
-        logger.error(f"Error loading chat history: {e}")
+    session_id = str(data.get("session_id") or DEFAULT_SESSION_ID)
 
     # Process the question
     try:
         chain_instance = chain_singleton.ChainSingleton.get_instance()
         chain = chain_instance.get_chain()
-        response = chain.invoke(input={"question": user_question})
+        response = chain.invoke(input=conversation.prepare_input(user_question, session_id))
         answer = response  
     except Exception as e:
         logger.error(f"Error processing question: {e}")
@@ -49,17 +55,117 @@ def ask_question():
 
     # Update chat history safely
     try:
-        chat_manager.append_to_history(chat_history, user_question, answer)
-        chat_manager.save_chat_history(chat_history)
+        conversation.record_turn(user_question, answer, session_id)
     except Exception as e:
         logger.error(f"Error saving chat history: {e}")
 
-    return jsonify({"answer": answer})
+    return jsonify({"answer": answer, "session_id": session_id})
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_question_stream():
+    """
+    Endpoint to process a user's question, streaming the answer as it is generated.
+
+    Expects JSON payload with key 'question' and an optional 'session_id', as for `/ask`.
+    Returns Server-Sent Events: one `data` event
+    per generated token (`{"token": ...}`), followed by a `done` event with the full answer,
+    or an `error` event if generation fails. The full answer is written to chat history at the end.
+    """
+    data = request.get_json(silent=True)
+    if not data or "question" not in data:
+        logger.warning("Invalid or missing 'question' in request payload.")
+        return jsonify({"error": "Invalid or missing 'question'"}), 400
+
+    user_question = data["question"].strip()
+    if not user_question:
+        return jsonify({"error": "Question cannot be empty"}), 400
+    session_id = str(data.get("session_id") or DEFAULT_SESSION_ID)
+
+    def generate():
+        tokens = []
+        started = time.perf_counter()
+        try:
+            chain = chain_singleton.ChainSingleton.get_instance().get_chain()
+            for token in chain.stream(input=conversation.prepare_input(user_question, session_id)):
+                if not tokens:
+                    logger.info("Time to first token: %.2fs", time.perf_counter() - started)
+                tokens.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to process question'})}\n\n"
+            return
+
+        answer = "".join(tokens)
+        try:
+            conversation.record_turn(user_question, answer, session_id)
+        except Exception as e:
+            logger.error(f"Error saving chat history: {e}")
+        yield f"event: done\ndata: {json.dumps({'answer': answer})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/ask/batch", methods=["POST"])
+def ask_batch():
+    """
+    Endpoint to answer many independent questions in one request.
+
+    Expects JSON payload with key 'questions' (a list of strings). Returns newline-delimited
+    JSON, one object per question in completion order: `{"index", "question", "answer"}`,
+    or `{"index", "question", "error"}` if that question failed.
+    """
+    data = request.get_json(silent=True)
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions:
+        logger.warning("Invalid or missing 'questions' in request payload.")
+        return jsonify({"error": "Invalid or missing 'questions'"}), 400
+
+    questions = [str(question).strip() for question in questions]
+    if not all(questions):
+        return jsonify({"error": "Questions cannot be empty"}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+
+    def generate():
+        chain_instance = chain_singleton.ChainSingleton.get_instance()
+        for result in iter_batch_answers(chain_instance.get_chain(), questions, chain_instance.get_embeddings()):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def is_admin_request() -> bool:
+    """Checks the X-Admin-Token header against ADMIN_API_TOKEN. Denies all requests if no token is configured."""
+    return bool(ADMIN_API_TOKEN) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_API_TOKEN)
+
+@app.route("/admin/reindex", methods=["POST"])
+def reindex():
+    """
+    Endpoint to refresh the index without a restart.
+
+    Changed documents are indexed incrementally in the background, then the processing chain
+    is rebuilt and swapped in. Questions keep being answered meanwhile. Returns 202 immediately
+    with the refresh status; poll `GET /admin/reindex` for the outcome.
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    index_refresher.request_refresh()
+    return jsonify({"status": "scheduled", "refresh": index_refresher.get_status()}), 202
+
+@app.route("/admin/reindex", methods=["GET"])
+def reindex_status():
+    """Returns whether an index refresh is running and the outcome of the last one."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(index_refresher.get_status())
 
 @app.route("/health", methods=["GET"])
 def health_check():
-    """Health check endpoint."""
-    return jsonify({"status": "ok"}), 200
+    """Health check endpoint, including the state of index refreshes and source syncs."""
+    return jsonify({"status": "ok", "index": index_refresher.get_status()}), 200
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)  # Allows external access
\ No newline at end of file
@@ -0,0 +1,244 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+import asyncio
+import hmac
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from common import chain_singleton
+from common.batch import prewarm_query_embeddings
+from common.chat_history_manager import DEFAULT_SESSION_ID
+from common.config import ADMIN_API_TOKEN, BATCH_MAX_CONCURRENCY, BATCH_MAX_QUESTIONS, REQUEST_TIMEOUT
+from common.request_limiter import QueueFullError, RequestLimiter
+from initialize import initialize_resources, conversation, index_refresher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+limiter = RequestLimiter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize resources on startup without blocking the event loop."""
+    if not await run_in_threadpool(initialize_resources):
+        logger.error("Resource initialization failed. The application may not work properly.")
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+async def get_question(request: Request):
+    """Extracts the question and session ID from the JSON payload, returning (question, session ID, error response)."""
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    if not isinstance(data, dict) or "question" not in data:
+        logger.warning("Invalid or missing 'question' in request payload.")
+        return None, None, JSONResponse({"error": "Invalid or missing 'question'"}, status_code=400)
+
+    user_question = str(data["question"]).strip()
+    if not user_question:
+        return None, None, JSONResponse({"error": "Question cannot be empty"}, status_code=400)
+    return user_question, str(data.get("session_id") or DEFAULT_SESSION_ID), None
+
+def busy_response() -> JSONResponse:
+    """Response returned when the request could not get an LLM slot in time."""
+    return JSONResponse(
+        {"error": "Server is busy, please retry later"},
+        status_code=503,
+        headers={"Retry-After": "1"}
+    )
+
+@app.post("/ask")
+async def ask_question(request: Request):
+    """
+    Endpoint to process a user's question.
+
+    Expects JSON payload with key 'question' and an optional 'session_id' selecting the
+    conversation whose history is given to the LLM. Returns the answer in JSON format,
+    503 if the LLM backend is saturated, or 504 if the request deadline passes.
+    """
+    user_question, session_id, error = await get_question(request)
+    if error:
+        return error
+
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    try:
+        async with limiter.slot(timeout=REQUEST_TIMEOUT):
+            chain = chain_singleton.ChainSingleton.get_instance().get_chain()
+            chain_input = await run_in_threadpool(conversation.prepare_input, user_question, session_id)
+            answer = await asyncio.wait_for(
+                chain.ainvoke(input=chain_input),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+    except QueueFullError:
+        return busy_response()
+    except asyncio.TimeoutError:
+        if time.monotonic() >= deadline:
+            logger.warning("Request deadline exceeded for question: %s", user_question)
+            return JSONResponse({"error": "Request timed out"}, status_code=504)
+        return busy_response()
+    except Exception as e:
+        logger.error(f"Error processing question: {e}")
+        return JSONResponse({"error": "Failed to process question"}, status_code=500)
+
+    try:
+        await run_in_threadpool(conversation.record_turn, user_question, answer, session_id)
+    except Exception as e:
+        logger.error(f"Error saving chat history: {e}")
+
+    return {"answer": answer, "session_id": session_id}
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: Request):
+    """
+    Endpoint to process a user's question, streaming the answer as Server-Sent Events.
+
+    The LLM slot is held for the whole stream, and the stream is cut off with an
+    `error` event once the request deadline passes.
+    """
+    user_question, session_id, error = await get_question(request)
+    if error:
+        return error
+
+    # Reject immediately when saturated, before the streaming response starts
+    if limiter.is_full():
+        return busy_response()
+
+    async def generate():
+        tokens = []
+        try:
+            async with asyncio.timeout(REQUEST_TIMEOUT):
+                async with limiter.slot(timeout=REQUEST_TIMEOUT):
+                    chain = chain_singleton.ChainSingleton.get_instance().get_chain()
+                    chain_input = await run_in_threadpool(conversation.prepare_input, user_question, session_id)
+                    async for token in chain.astream(input=chain_input):
+                        tokens.append(token)
+                        yield f"data: {json.dumps({'token': token})}\n\n"
+        except QueueFullError:
+            yield f"event: error\ndata: {json.dumps({'error': 'Server is busy, please retry later'})}\n\n"
+            return
+        except TimeoutError:
+            logger.warning("Request deadline exceeded while streaming: %s", user_question)
+            yield f"event: error\ndata: {json.dumps({'error': 'Request timed out'})}\n\n"
+            return
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to process question'})}\n\n"
+            return
+
+        answer = "".join(tokens)
+        try:
+            await run_in_threadpool(conversation.record_turn, user_question, answer, session_id)
+        except Exception as e:
+            logger.error(f"Error saving chat history: {e}")
+        yield f"event: done\ndata: {json.dumps({'answer': answer})}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/ask/batch")
+async def ask_batch(request: Request):
+    """
+    Endpoint to answer many independent questions in one request.
+
+    Expects JSON payload with key 'questions' (a list of strings). Question embeddings are
+    computed in one batch, then up to BATCH_MAX_CONCURRENCY questions of the batch are
+    answered at a time, each holding an LLM slot. Returns newline-delimited JSON, one object
+    per question in completion order: `{"index", "question", "answer"}` or
+    `{"index", "question", "error"}`.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions:
+        logger.warning("Invalid or missing 'questions' in request payload.")
+        return JSONResponse({"error": "Invalid or missing 'questions'"}, status_code=400)
+
+    questions = [str(question).strip() for question in questions]
+    if not all(questions):
+        return JSONResponse({"error": "Questions cannot be empty"}, status_code=400)
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}, status_code=400)
+
+    chain_instance = chain_singleton.ChainSingleton.get_instance()
+    chain = chain_instance.get_chain()
+    batch_slots = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+
+    async def answer(index: int, question: str):
+        result = {"index": index, "question": question}
+        async with batch_slots:
+            try:
+                async with limiter.slot(timeout=REQUEST_TIMEOUT):
+                    result["answer"] = await asyncio.wait_for(
+                        chain.ainvoke(input={"question": question}), timeout=REQUEST_TIMEOUT
+                    )
+            except QueueFullError:
+                result["error"] = "Server is busy, please retry later"
+            except asyncio.TimeoutError:
+                result["error"] = "Request timed out"
+            except Exception as e:
+                logger.error(f"Error answering batch question {index}: {e}")
+                result["error"] = "Failed to process question"
+        return result
+
+    async def generate():
+        await run_in_threadpool(prewarm_query_embeddings, chain_instance.get_embeddings(), questions)
+        tasks = [asyncio.create_task(answer(index, question)) for index, question in enumerate(questions)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def is_admin_request(request: Request) -> bool:
+    """Checks the X-Admin-Token header against ADMIN_API_TOKEN. Denies all requests if no token is configured."""
+    return bool(ADMIN_API_TOKEN) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_API_TOKEN)
+
+@app.post("/admin/reindex")
+async def reindex(request: Request):
+    """
+    Endpoint to refresh the index without a restart.
+
+    Changed documents are indexed incrementally in a background thread, then the processing
+    chain is rebuilt and swapped in. Questions keep being answered meanwhile. Returns 202
+    immediately with the refresh status; poll `GET /admin/reindex` for the outcome.
+    """
+    if not is_admin_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    index_refresher.request_refresh()
+    return JSONResponse({"status": "scheduled", "refresh": index_refresher.get_status()}, status_code=202)
+
+@app.get("/admin/reindex")
+async def reindex_status(request: Request):
+    """Returns whether an index refresh is running and the outcome of the last one."""
+    if not is_admin_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return index_refresher.get_status()
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint, including the current LLM concurrency usage and index sync state."""
+    return {"status": "ok", "llm": limiter.get_stats(), "index": index_refresher.get_status()}
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=5000)  # Allows external access
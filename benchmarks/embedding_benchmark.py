@@ -0,0 +1,124 @@
+"""
+Benchmarks embedding throughput (sentences/sec) of the embedding engine against the
+previous setup: langchain's HuggingFaceEmbeddings on CPU, default batch size, one process.
+
+Texts are synthetic chunks of varying length, up to the ingestion chunk size. Each
+configuration also reports the mean cosine similarity of its vectors to the baseline's,
+to show what ONNX export and int8 quantization cost in accuracy:
+
+    PYTHONPATH=. python benchmarks/embedding_benchmark.py --texts 5000 --workers 4
+
+The ONNX and OpenVINO backends need `pip install "sentence-transformers[onnx]"` (or
+`[openvino]`); configurations whose dependencies are missing are skipped.
+"""
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from common.config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS
+from common.embedding_engine import SentenceTransformerEmbeddings
+from common.vectorstore import CHUNK_SIZE
+
+WORDS = (
+    "index query document chunk vector embedding search retrieval model answer source page "
+    "ticket issue release server database cluster latency throughput request response user "
+    "configuration deployment backup network error update version report summary"
+).split()
+
+
+def make_texts(count: int, seed: int = 0) -> List[str]:
+    """Returns `count` pseudo-random texts of 5 to CHUNK_SIZE characters, mostly short like real chunk tails."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        target = int(5 + (CHUNK_SIZE - 5) * rng.random() ** 2)
+        words: List[str] = []
+        while sum(len(word) + 1 for word in words) < target:
+            words.append(rng.choice(WORDS))
+        texts.append(" ".join(words))
+    return texts
+
+
+def baseline() -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME, model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": False}
+    )
+
+
+def configurations(args: argparse.Namespace) -> Dict[str, Callable[[], Embeddings]]:
+    engine = dict(batch_size=args.batch_size, batch_tokens=args.batch_tokens)
+    return {
+        "baseline": baseline,
+        "torch": lambda: SentenceTransformerEmbeddings(backend="torch", **engine),
+        "onnx": lambda: SentenceTransformerEmbeddings(backend="onnx", **engine),
+        "onnx-int8": lambda: SentenceTransformerEmbeddings(backend="onnx", model_file=args.int8_file, **engine),
+        "torch-workers": lambda: SentenceTransformerEmbeddings(backend="torch", workers=args.workers, **engine),
+        "onnx-int8-workers": lambda: SentenceTransformerEmbeddings(
+            backend="onnx", model_file=args.int8_file, workers=args.workers, **engine
+        ),
+    }
+
+
+def unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    rows = np.asarray(vectors, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000, help="Texts to embed per configuration.")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Maximum texts per batch.")
+    parser.add_argument("--batch-tokens", type=int, default=EMBEDDING_BATCH_TOKENS, help="Maximum padded tokens per batch.")
+    parser.add_argument("--workers", type=int, default=2, help="Processes of the *-workers configurations.")
+    parser.add_argument(
+        "--int8-file", default="onnx/model_qint8_avx512_vnni.onnx",
+        help="Quantized ONNX file within the model repository."
+    )
+    parser.add_argument(
+        "--configs", default="baseline,torch,onnx,onnx-int8,torch-workers",
+        help="Comma-separated configurations: baseline, torch, onnx, onnx-int8, torch-workers, onnx-int8-workers."
+    )
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    available = configurations(args)
+    print(f"Embedding {len(texts)} texts with {EMBEDDING_MODEL_NAME}:")
+
+    reference = None
+    baseline_rate = None
+    for name in args.configs.split(","):
+        try:
+            embedding = available[name]()
+        except Exception as e:
+            # sentence-transformers raises a plain Exception when a backend's packages are missing
+            print(f"  {name:18s} skipped: {e}")
+            continue
+        # Warm up, so model loading and the worker pool are not measured
+        embedding.embed_documents(texts[:args.batch_size * max(1, args.workers) + 1])
+
+        started = time.perf_counter()
+        vectors = unit_rows(embedding.embed_documents(texts))
+        rate = len(texts) / (time.perf_counter() - started)
+        if hasattr(embedding, "close"):
+            embedding.close()
+
+        if reference is None:
+            reference, baseline_rate = vectors, rate
+        agreement = float(np.mean(np.sum(vectors * reference, axis=1)))
+        print(f"  {name:18s} {rate:8.1f} sentences/s  x{rate / baseline_rate:4.2f}  cosine to first {agreement:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmarks PGVector upsert throughput, ANN index build time, and query latency/recall.
+
+Vectors are random, so only the database is measured, not the embedding model. Run it
+against a scratch database, as the ANN index covers the whole embedding table:
+
+    docker compose -f docker-compose/docker-compose.yml up -d postgres
+    POSTGRES_DB=postgres POSTGRES_PASSWORD=... POSTGRES_VECTOR_INDEX=hnsw \\
+        PYTHONPATH=. python benchmarks/pgvector_benchmark.py --rows 50000
+
+POSTGRES_VECTOR_INDEX selects the index ("none", "hnsw" or "ivfflat"), and the
+POSTGRES_HNSW_* / POSTGRES_IVFFLAT_* and POSTGRES_POOL_* settings apply as in the app.
+"""
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+import argparse
+import hashlib
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_postgres import PGVector
+
+from common.config import POSTGRES_VECTOR_INDEX
+from common.postgres_store import ensure_vector_index, get_postgres_engine
+
+COLLECTION_NAME = "rag_llm_benchmark"
+
+
+class RandomEmbeddings(Embeddings):
+    """Deterministic pseudo-random unit vectors, derived from a hash of the text."""
+
+    def __init__(self, dimensions: int) -> None:
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def open_store(embedding: RandomEmbeddings, reset: bool) -> PGVector:
+    return PGVector(
+        connection=get_postgres_engine(), embeddings=embedding, collection_name=COLLECTION_NAME,
+        embedding_length=embedding.dimensions, pre_delete_collection=reset
+    )
+
+
+def ingest(store: PGVector, vectors: np.ndarray, batch_size: int) -> float:
+    """Upserts all vectors in batches and returns the rows per second."""
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch_size):
+        ids = [f"chunk-{i}" for i in range(start, min(start + batch_size, len(vectors)))]
+        store.add_embeddings(
+            texts=[f"benchmark chunk {chunk_id}" for chunk_id in ids],
+            embeddings=vectors[start:start + batch_size].tolist(),
+            metadatas=[{"source": "benchmark"} for _ in ids],
+            ids=ids,
+        )
+    return len(vectors) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Vectors to upsert.")
+    parser.add_argument("--dimensions", type=int, default=384, help="Vector size.")
+    parser.add_argument("--batch-sizes", default="64,256,1024", help="Comma-separated upsert batch sizes to compare.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries used for latency and recall.")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query.")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collection afterwards.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.rows, args.dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embedding = RandomEmbeddings(args.dimensions)
+
+    print(f"Upserting {args.rows} vectors of {args.dimensions} dimensions:")
+    store = None
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        store = open_store(embedding, reset=True)
+        print(f"  batch size {batch_size:5d}: {ingest(store, vectors, batch_size):10.0f} rows/s")
+
+    started = time.perf_counter()
+    ensure_vector_index(get_postgres_engine(), args.dimensions)
+    print(f"Index ({POSTGRES_VECTOR_INDEX}) built in {time.perf_counter() - started:.1f}s")
+
+    # Exact neighbours by brute force, to measure the recall of the ANN index
+    queries = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, exact):
+        started = time.perf_counter()
+        documents = store.similarity_search_by_vector(query.tolist(), k=args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {int(doc.page_content.rsplit("-", 1)[1]) for doc in documents}
+        hits += len(found & set(expected.tolist()))
+
+    print(
+        f"Queries: p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+        f"recall@{args.k} {hits / (args.queries * args.k):.3f}"
+    )
+
+    if not args.keep:
+        store.delete_collection()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
+import sys
+import time
+
+# Start timing imports before anything else is loaded
+from common import startup_profile
+if "--profile-startup" in sys.argv:
+    startup_profile.start_profiling()
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+import argparse
+import json
 import logging
 from common import chain_singleton
-from initialize import initialize_resources, chat_manager
+from common.batch import iter_batch_answers, read_questions
+from initialize import initialize_resources, chat_manager, conversation
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -40,25 +56,71 @@ def process_user_question(user_question: str, chat_history: list) -> None:
         # Now, access the chain via the instance
         chain = chain_instance.get_chain()
 
-        response =chain.invoke(input={"question": user_question})
+        # Stream the answer token by token as it is generated
         logger.info(f"Processing response for: {user_question}")
-        answer = response  # Adjust if response needs processing
-        print(f"\nAnswer: {answer}")
+        print("\nAnswer: ", end="", flush=True)
+        tokens = []
+        started = time.perf_counter()
+        for token in chain.stream(input=conversation.prepare_input(user_question)):
+            if not tokens:
+                logger.debug("Time to first token: %.2fs", time.perf_counter() - started)
+            tokens.append(token)
+            print(token, end="", flush=True)
+        print()
+        answer = "".join(tokens)
 
         # Append the question and answer to chat history
-        chat_manager.append_to_history(user_question, answer)
+        conversation.record_turn(user_question, answer)
     except Exception as e:
         logger.error(f"Error processing question: {e}")
 
+def answer_questions_file(path: str) -> None:
+    """Answers every question in the file, printing one JSON line per question as it finishes."""
+    try:
+        questions = read_questions(path)
+    except OSError as e:
+        logger.error(f"Error reading questions file: {e}")
+        return
+
+    logger.info(f"Answering {len(questions)} questions from {path}")
+    chain_instance = chain_singleton.ChainSingleton.get_instance()
+    for result in iter_batch_answers(chain_instance.get_chain(), questions, chain_instance.get_embeddings()):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ask questions about the indexed documents.")
+    parser.add_argument(
+        "--questions-file",
+        help="Answer the questions in this file (one per line) and print the results as JSON lines, instead of starting an interactive session."
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print how long startup spent importing each package and in each initialization phase."
+    )
+    return parser.parse_args()
+
 def main() -> None:
     """
     Main function to run the interactive document query CLI application.
     """
+    args = parse_args()
+    profiler = startup_profile.get_profiler()
+    if profiler is not None:
+        profiler.record_phase("Imports", time.perf_counter() - profiler.started)
 
     # Initialize resources and handle failure
-    if not initialize_resources():
+    initialized = initialize_resources()
+    if profiler is not None:
+        profiler.uninstall()
+        print(profiler.format_report(), flush=True)
+    if not initialized:
         logger.error("Failed to initialize resources. Exiting.")
         return
+
+    if args.questions_file:
+        answer_questions_file(args.questions_file)
+        return
     
     # Load chat history
     chat_history = load_chat_history_with_error_handling()
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from common.config import (
+    ANSWER_CACHE_FILE, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL
+)
+from common.index_manifest import get_index_version
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        embedding,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: int = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        cache_file: str = ANSWER_CACHE_FILE,
+        version_fn=get_index_version,
+    ) -> None:
+        """
+        Caches answers and matches new questions to cached ones by embedding similarity.
+
+        Entries expire after `ttl` seconds, the least recently used entries are evicted beyond
+        `max_entries`, and entries created for a different index version are never returned,
+        so answers are dropped as soon as the indexed documents change.
+
+        Entries are persisted in SQLite with float32 vector blobs, one row each, so storing
+        an answer writes only that answer, not the whole cache.
+
+        Args:
+            embedding: The embedding model used to embed questions.
+            threshold (float): Minimum cosine similarity for a cached question to match.
+            ttl (int): Seconds an answer stays valid (0 disables expiry).
+            max_entries (int): Maximum number of cached answers.
+            cache_file (str): Path of the SQLite file the cache is persisted to.
+            version_fn: Returns the current index version.
+        """
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_file = Path(cache_file)
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the connection, so disk writes never hold up lookups on `_lock`
+        self._db_lock = threading.Lock()
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id TEXT PRIMARY KEY, question TEXT NOT NULL, answer TEXT NOT NULL, vector BLOB NOT NULL, "
+            "created REAL NOT NULL, index_version INTEGER, last_used REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self._load()
+
+    def _load(self) -> None:
+        """Loads persisted entries, least recently used first."""
+        try:
+            rows = self._connection.execute(
+                "SELECT id, question, answer, vector, created, index_version FROM answers ORDER BY last_used"
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Error loading answer cache from %s: %s", self.cache_file, e)
+            return
+
+        for entry_id, question, answer, vector, created, index_version in rows:
+            self._entries[entry_id] = {
+                "id": entry_id,
+                "question": question,
+                "answer": answer,
+                "vector": np.frombuffer(vector, dtype=np.float32),
+                "created": created,
+                "index_version": index_version,
+            }
+        self._delete(self._purge())
+        logger.info("Answer cache loaded with %d entries.", len(self._entries))
+
+    def _write(self, statement: str, rows: Iterable[tuple]) -> None:
+        """Runs a write statement for each row and commits, logging instead of raising on errors."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._db_lock:
+            try:
+                self._connection.executemany(statement, rows)
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.error("Failed to update answer cache in %s: %s", self.cache_file, e)
+
+    def _delete(self, entry_ids: Iterable[str]) -> None:
+        self._write("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge(self) -> List[str]:
+        """Drops expired entries and entries built against another index version, returning their IDs."""
+        now = time.time()
+        version = self.version_fn()
+        stale = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry["index_version"] != version or (self.ttl and now - entry["created"] > self.ttl)
+        ]
+        for entry_id in stale:
+            del self._entries[entry_id]
+        return stale
+
+    def lookup(self, question: str) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar cached question, if it is similar enough.
+
+        Args:
+            question (str): The user's question.
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss.
+        """
+        vector = self._normalize(self.embedding.embed_query(question))
+        with self._lock:
+            stale = self._purge()
+            hit = self._match(question, vector)
+        self._delete(stale)
+        if hit is None:
+            return None
+        entry_id, answer = hit
+        self._write("UPDATE answers SET last_used = ? WHERE id = ?", [(time.time(), entry_id)])
+        return answer
+
+    def _match(self, question: str, vector: np.ndarray) -> Optional[Tuple[str, str]]:
+        """Returns the ID and answer of the best matching entry, or None on a miss. Called with `_lock` held."""
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        entry_ids = list(self._entries)
+        matrix = np.stack([self._entries[entry_id]["vector"] for entry_id in entry_ids])
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        entry = self._entries[entry_ids[best]]
+        self._entries.move_to_end(entry_ids[best])
+        self.hits += 1
+        logger.info(
+            "Answer cache hit (similarity %.3f) for '%s' via cached question '%s'.",
+            similarities[best], question, entry["question"]
+        )
+        return entry_ids[best], entry["answer"]
+
+    def store(self, question: str, answer: str) -> None:
+        """Caches the answer to a question, evicting the least recently used entries if needed."""
+        vector = self._normalize(self.embedding.embed_query(question))
+        entry = {
+            "id": uuid.uuid4().hex,
+            "question": question,
+            "answer": answer,
+            "vector": vector,
+            "created": time.time(),
+            "index_version": self.version_fn(),
+        }
+        with self._lock:
+            self._entries[entry["id"]] = entry
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        self._write(
+            "INSERT OR REPLACE INTO answers (id, question, answer, vector, created, index_version, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(
+                entry["id"], question, answer, vector.tobytes(), entry["created"], entry["index_version"],
+                entry["created"]
+            )]
+        )
+        self._delete(evicted)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the number of cached answers."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class AnswerCachingChain:
+    def __init__(self, chain, cache: SemanticAnswerCache) -> None:
+        """
+        Puts a semantic answer cache in front of a RAG chain.
+
+        Exposes the same invoke/ainvoke/stream/astream calls as the chain, taking
+        `{"question": ..., "history": ...}` as input. A cache hit returns the cached answer
+        without running retrieval or generation; a miss runs the chain and caches its answer.
+
+        Only questions without conversation history are looked up and cached: a follow-up
+        question ("and the second one?") depends on its conversation, so another session's
+        answer to a similar-looking question would be wrong for it.
+        """
+        self.chain = chain
+        self.cache = cache
+
+    def _lookup(self, input: Dict[str, Any]) -> Optional[str]:
+        if input.get("history"):
+            return None
+        try:
+            return self.cache.lookup(input["question"])
+        except Exception as e:
+            logger.error(f"Error reading answer cache: {e}")
+            return None
+
+    def _store(self, input: Dict[str, Any], answer: str) -> None:
+        if input.get("history"):
+            return
+        try:
+            self.cache.store(input["question"], answer)
+        except Exception as e:
+            logger.error(f"Error writing answer cache: {e}")
+
+    def invoke(self, input: Dict[str, Any], config=None, **kwargs) -> str:
+        answer = self._lookup(input)
+        if answer is None:
+            answer = self.chain.invoke(input, config, **kwargs)
+            self._store(input, answer)
+        return answer
+
+    async def ainvoke(self, input: Dict[str, Any], config=None, **kwargs) -> str:
+        answer = await asyncio.to_thread(self._lookup, input)
+        if answer is None:
+            answer = await self.chain.ainvoke(input, config, **kwargs)
+            await asyncio.to_thread(self._store, input, answer)
+        return answer
+
+    def stream(self, input: Dict[str, Any], config=None, **kwargs):
+        answer = self._lookup(input)
+        if answer is not None:
+            yield answer
+            return
+
+        tokens = []
+        for token in self.chain.stream(input, config, **kwargs):
+            tokens.append(token)
+            yield token
+        self._store(input, "".join(tokens))
+
+    async def astream(self, input: Dict[str, Any], config=None, **kwargs):
+        answer = await asyncio.to_thread(self._lookup, input)
+        if answer is not None:
+            yield answer
+            return
+
+        tokens = []
+        async for token in self.chain.astream(input, config, **kwargs):
+            tokens.append(token)
+            yield token
+        await asyncio.to_thread(self._store, input, "".join(tokens))
@@ -0,0 +1,76 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List
+
+from common.config import BATCH_MAX_CONCURRENCY
+from common.embedding_cache import CachedEmbeddings
+from common.retrievers import embed_queries
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: str) -> List[str]:
+    """Reads one question per line, skipping blank lines and lines starting with '#'."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def prewarm_query_embeddings(embeddings, questions: List[str]) -> None:
+    """
+    Embeds all questions in one batched call, so the retrievers' per-question embed_query
+    calls are then served from the embedding cache. Skipped when the cache is disabled,
+    as the vectors would be computed once here and again by the retrievers.
+    """
+    if not isinstance(embeddings, CachedEmbeddings):
+        return
+    started = time.perf_counter()
+    try:
+        embed_queries(embeddings, list(dict.fromkeys(questions)))
+        logger.info("Embedded %d batch questions in %.2fs.", len(questions), time.perf_counter() - started)
+    except Exception as e:
+        logger.error(f"Error pre-computing question embeddings: {e}")
+
+
+def iter_batch_answers(
+    chain, questions: List[str], embeddings=None, max_concurrency: int = BATCH_MAX_CONCURRENCY
+) -> Iterator[Dict[str, Any]]:
+    """
+    Answers a batch of independent questions, yielding each result as soon as it is ready.
+
+    With the embedding cache enabled, question embeddings are computed up front in one batch.
+    Then up to `max_concurrency` chain invocations (retrieval and generation) run in parallel.
+
+    Args:
+        chain: The RAG chain.
+        questions (List[str]): The questions to answer.
+        embeddings: The embedding model to pre-compute question embeddings with.
+        max_concurrency (int): Maximum number of questions answered at the same time.
+
+    Yields:
+        Dict[str, Any]: `{"index", "question", "answer"}`, or `{"index", "question", "error"}`
+            if the question failed, in completion order.
+    """
+    prewarm_query_embeddings(embeddings, questions)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="batch") as executor:
+        futures = {
+            executor.submit(chain.invoke, {"question": question}): index
+            for index, question in enumerate(questions)
+        }
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                result = {"index": index, "question": questions[index]}
+                try:
+                    result["answer"] = future.result()
+                except Exception as e:
+                    logger.error(f"Error answering batch question {index}: {e}")
+                    result["error"] = "Failed to process question"
+                yield result
+        finally:
+            # Stop queued questions if the consumer goes away (e.g. the client disconnected)
+            for future in futures:
+                future.cancel()
+    logger.info("Answered %d batch questions in %.2fs.", len(questions), time.perf_counter() - started)
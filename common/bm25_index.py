@@ -0,0 +1,283 @@
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from common.config import BM25_INDEX_FILE, BM25_MAX_DF_RATIO
+
+logger = logging.getLogger(__name__)
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Words joined by '-', '.', '_', ':' or '#' are kept whole (e.g. "ERR-1042", "db.pool.size")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-._:#][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+# Terms with at most this many postings are always scored, so the document frequency cap only affects large corpora
+MIN_CAPPED_POSTINGS = 1000
+
+# Query terms are scored in SQLite, in one statement over the postings of all kept terms
+SEARCH_QUERY = f"""
+WITH query (term, idf) AS (VALUES {{values}})
+SELECT chunks.chunk_id, chunks.text, chunks.metadata FROM (
+    SELECT postings.doc AS doc, SUM(
+        query.idf * postings.freq * {BM25_K1 + 1}
+        / (postings.freq + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * chunks.length / ?))
+    ) AS score
+    FROM query
+    JOIN postings ON postings.term = query.term
+    JOIN chunks ON chunks.id = postings.doc
+    GROUP BY postings.doc
+    ORDER BY score DESC
+    LIMIT ?
+) AS ranked
+JOIN chunks ON chunks.id = ranked.doc
+ORDER BY ranked.score DESC
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into terms. Compound identifiers are indexed both whole
+    and by their parts, so "ERR-1042" matches queries for "ERR-1042" and for "1042".
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, index_file: str = BM25_INDEX_FILE, max_df_ratio: float = BM25_MAX_DF_RATIO) -> None:
+        """
+        Inverted index with BM25 scoring over the indexed chunks, persisted in SQLite.
+
+        Chunks are added and removed by chunk ID alongside the vector store. Their postings,
+        term frequencies and lengths are stored as they are indexed, so opening the index reads
+        nothing up front and queries score only the postings of their terms. Changes are made
+        in one transaction that `save()` commits, so searches (from this or another process)
+        keep seeing the previous index until a sync has completed.
+
+        Args:
+            index_file (str): Path of the SQLite file the index is persisted to.
+            max_df_ratio (float): Query terms found in more than this share of the chunks
+                (e.g. "the", "is") are skipped, as they carry almost no weight but would make
+                a search score most of the corpus. Terms with up to MIN_CAPPED_POSTINGS
+                postings are always scored.
+        """
+        self.index_file = Path(index_file)
+        self.max_df_ratio = max_df_ratio
+        self._lock = threading.RLock()
+        self._readers = threading.local()
+        self._reset_changes()
+
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = self._connect()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # A larger page cache for the writer, as postings are inserted in term order rather than appended
+        self._connection.execute("PRAGMA cache_size=-65536")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, text TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, doc INTEGER NOT NULL, freq INTEGER NOT NULL, PRIMARY KEY (term, doc)) WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.commit()
+        logger.info("BM25 index opened at %s with %d chunks.", self.index_file, len(self))
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.index_file), timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """Returns this thread's read connection, which only sees committed changes."""
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = self._readers.connection = self._connect()
+        return connection
+
+    @staticmethod
+    def _get_meta(connection: sqlite3.Connection, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _reset_changes(self) -> None:
+        """Forgets the buffered document frequency and length changes."""
+        self._df_changes: Counter = Counter()
+        self._count_change = 0
+        self._length_change = 0
+
+    def _write_changes(self) -> None:
+        """Applies the buffered document frequency and length changes, once per save instead of per chunk."""
+        changes = [(term, change) for term, change in self._df_changes.items() if change]
+        self._connection.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            changes
+        )
+        self._connection.executemany(
+            "DELETE FROM terms WHERE term = ? AND df <= 0", [(term,) for term, change in changes if change < 0]
+        )
+        self._set_meta("count", int(self._get_meta(self._connection, "count", "0")) + self._count_change)
+        self._set_meta("total_length", int(self._get_meta(self._connection, "total_length", "0")) + self._length_change)
+        self._reset_changes()
+
+    @property
+    def version(self) -> Optional[int]:
+        """The index manifest version the committed chunks correspond to."""
+        with self._lock:
+            value = self._get_meta(self._connection, "version")
+        return int(value) if value is not None else None
+
+    def __contains__(self, chunk_id: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM chunks WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._get_meta(self._connection, "count", "0")) + self._count_change
+
+    def save(self, version: Optional[int] = None) -> None:
+        """
+        Commits the pending changes, making them visible to searches.
+
+        Args:
+            version (Optional[int]): The index manifest version the chunks correspond to.
+        """
+        with self._lock:
+            if version is None:
+                self._connection.execute("DELETE FROM meta WHERE key = 'version'")
+            else:
+                self._set_meta("version", version)
+            self._write_changes()
+            self._connection.commit()
+            logger.info("BM25 index saved with %d chunks.", len(self))
+
+    def rollback(self) -> None:
+        """Discards the changes made since the last `save()`, e.g. after a failed sync."""
+        with self._lock:
+            self._connection.rollback()
+            self._reset_changes()
+
+    def clear(self) -> None:
+        """Removes all chunks."""
+        with self._lock:
+            for table in ("chunks", "postings", "terms", "meta"):
+                self._connection.execute(f"DELETE FROM {table}")
+            self._reset_changes()
+
+    def add(self, chunk_id: str, document: Document) -> None:
+        """Adds a chunk, replacing any chunk with the same ID."""
+        term_freqs = Counter(tokenize(document.page_content))
+        length = sum(term_freqs.values())
+        with self._lock:
+            self.remove(chunk_id)
+            doc = self._connection.execute(
+                "INSERT INTO chunks (chunk_id, text, metadata, length) VALUES (?, ?, ?, ?)",
+                (chunk_id, document.page_content, json.dumps(document.metadata, ensure_ascii=False), length)
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO postings (term, doc, freq) VALUES (?, ?, ?)",
+                [(term, doc, freq) for term, freq in term_freqs.items()]
+            )
+            self._df_changes.update(term_freqs.keys())
+            self._count_change += 1
+            self._length_change += length
+
+    def remove(self, chunk_id: str) -> None:
+        """Removes a chunk if present."""
+        with self._lock:
+            row = self._connection.execute("SELECT id, length FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                return
+            doc, length = row
+            terms = [term for (term,) in self._connection.execute("SELECT term FROM postings WHERE doc = ?", (doc,))]
+            self._df_changes.subtract(terms)
+            self._connection.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+            self._connection.execute("DELETE FROM chunks WHERE id = ?", (doc,))
+            self._count_change -= 1
+            self._length_change -= length
+
+    def remove_many(self, chunk_ids: Iterable[str]) -> None:
+        """Removes several chunks."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self.remove(chunk_id)
+
+    def _query_weights(self, connection: sqlite3.Connection, terms: List[str], count: int) -> List[Tuple[str, float]]:
+        """Returns the IDF of each query term in the index, leaving out terms above the document frequency cap."""
+        placeholders = ",".join("?" * len(terms))
+        weights = []
+        for term, df in connection.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms):
+            if df > max(self.max_df_ratio * count, MIN_CAPPED_POSTINGS):
+                logger.debug("Skipping BM25 query term %r found in %d of %d chunks.", term, df, count)
+                continue
+            weights.append((term, math.log(1 + (count - df + 0.5) / (df + 0.5))))
+        return weights
+
+    def search(self, query: str, k: int) -> List[Document]:
+        """
+        Returns the `k` chunks with the highest BM25 score for the query.
+
+        Args:
+            query (str): The search query.
+            k (int): Number of results.
+
+        Returns:
+            List[Document]: Matching chunks, best first.
+        """
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+        connection = self._reader()
+        count = int(self._get_meta(connection, "count", "0"))
+        if not count:
+            return []
+        average_length = int(self._get_meta(connection, "total_length", "0")) / count
+
+        weights = self._query_weights(connection, terms, count)
+        if not weights:
+            return []
+        rows = connection.execute(
+            SEARCH_QUERY.format(values=",".join(["(?, ?)"] * len(weights))),
+            [value for weight in weights for value in weight] + [average_length or 1.0, k]
+        ).fetchall()
+        return [Document(page_content=text, metadata=json.loads(metadata)) for _, text, metadata in rows]
+
+
+_bm25_index: Optional[BM25Index] = None
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """Returns the process-wide BM25 index, opening it on first use."""
+    global _bm25_index
+    with _bm25_lock:
+        if _bm25_index is None:
+            _bm25_index = BM25Index()
+        return _bm25_index
@@ -1,11 +1,16 @@
 from common.prompt import create_chain
+from common.answer_cache import AnswerCachingChain, SemanticAnswerCache
+from common.config import USE_ANSWER_CACHE
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 class ChainSingleton:
     _instance = None
     _chain = None
+    _embeddings = None
+    _lock = threading.Lock()
 
     @classmethod
     def get_instance(cls):
@@ -14,20 +19,55 @@ class ChainSingleton:
             ChainSingleton._instance = ChainSingleton()
         return ChainSingleton._instance
 
+    @staticmethod
+    def build_chain(vector_db, llm):
+        """Builds a new chain over the vector store, wrapped in the answer cache if enabled."""
+        chain = create_chain(vector_db, llm)
+        if chain is not None and USE_ANSWER_CACHE:
+            logger.info("Using semantic answer cache.")
+            chain = AnswerCachingChain(chain, SemanticAnswerCache(vector_db.embeddings))
+        return chain
 
     def initialize_chain(self, vector_db, llm):
         """Initializes the chain."""
         if ChainSingleton._chain is None:
-            ChainSingleton._chain = create_chain(vector_db, llm)
+            chain = self.build_chain(vector_db, llm)
+            with ChainSingleton._lock:
+                ChainSingleton._chain = chain
+                ChainSingleton._embeddings = vector_db.embeddings
         if ChainSingleton._chain is None:
             logger.error("Failed to create a valid chain.")
             return False
         logger.info("Processing chain created successfully.")
 
+    def swap_chain(self, vector_db, llm):
+        """
+        Builds a chain over the (refreshed) vector store and replaces the current one.
+
+        The new chain is fully built before it is swapped in, so requests keep being served
+        by the old chain meanwhile, and requests that already fetched it finish on it.
+        """
+        chain = self.build_chain(vector_db, llm)
+        if chain is None:
+            logger.error("Failed to create a valid chain. Keeping the current one.")
+            return False
+        with ChainSingleton._lock:
+            ChainSingleton._chain = chain
+            ChainSingleton._embeddings = vector_db.embeddings
+        logger.info("Processing chain swapped.")
+        return True
+
     def get_chain(self):
         """Returns the initialized chain."""
-        return ChainSingleton._chain
+        with ChainSingleton._lock:
+            return ChainSingleton._chain
+
+    def get_embeddings(self):
+        """Returns the embedding model of the vector store the chain retrieves from."""
+        with ChainSingleton._lock:
+            return ChainSingleton._embeddings
 
     def clear_chain(self):
         """Clears the chain if you need to reinitialize it."""
-        ChainSingleton._chain = None
\ No newline at end of file
+        with ChainSingleton._lock:
+            ChainSingleton._chain = None
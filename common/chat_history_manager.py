@@ -1,95 +1,282 @@
 import json
+import hashlib
 import logging
+import os
+import re
 import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any
-from common.config import SESSION_FILE
+from queue import Queue
+from typing import List, Dict, Any, Iterator, Optional
+from common.config import (
+    SESSION_FILE, CHAT_HISTORY_DIR, CHAT_HISTORY_MAX_TURNS, CHAT_HISTORY_FSYNC
+)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SESSION_ID = "default"
+SHARD_SUFFIX = ".jsonl"
+SUMMARY_SUFFIX = ".summary.json"
+# Block size used when reading a shard backwards from its end
+TAIL_BLOCK_SIZE = 8192
+# Compact a shard once it holds this many times CHAT_HISTORY_MAX_TURNS turns
+COMPACTION_SLACK = 1.5
+SAFE_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def parse_records(lines) -> List[Dict[str, Any]]:
+    """Parses JSONL lines, skipping blank lines and a torn (partially written) last record."""
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            logger.warning("Skipping unreadable chat history record.")
+    return records
+
+
 class ChatHistoryManager:
-    def __init__(self) -> None:
+    def __init__(self, history_dir: str = CHAT_HISTORY_DIR, max_turns: int = CHAT_HISTORY_MAX_TURNS) -> None:
         """
         Initializes the chat history manager.
 
+        History is kept in one append-only JSONL file per session, so adding a turn writes a
+        single line regardless of how long the history is, and the last turns are read from
+        the end of the file without parsing the rest. Shards that grow beyond `max_turns`
+        are compacted in a background thread by atomically rewriting them with the most
+        recent turns only. A legacy single-file history (SESSION_FILE) is migrated into
+        the default session on first start.
+
         Args:
-            session_file (str): Path to the session file for storing chat history.
+            history_dir (str): Directory holding the per-session history files.
+            max_turns (int): Number of turns retained per session by compaction.
         """
-        self.session_file: Path = Path(SESSION_FILE)
-        self.chat_history: List[Dict[str, Any]] = self.load_chat_history()
+        self.history_dir: Path = Path(history_dir)
+        self.max_turns = max_turns
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._turn_counts: Dict[str, int] = {}
+        self._compaction_queue: Queue = Queue()
+        self._compaction_pending = set()
+        self._compactor: Optional[threading.Thread] = None
 
-    def load_chat_history(self) -> List[Dict[str, Any]]:
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+        self._migrate_legacy_file(Path(SESSION_FILE))
+
+    # --- Shards ---
+
+    def _shard_path(self, session_id: str) -> Path:
+        """Maps a session ID to its file, hashing IDs that are not safe file names."""
+        if not SAFE_SESSION_ID.match(session_id):
+            session_id = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return self.history_dir / f"{session_id}{SHARD_SUFFIX}"
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _write_shard(self, path: Path, records: List[Dict[str, Any]]) -> None:
+        """Rewrites a shard safely using an atomic write."""
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=path.parent, encoding="utf-8") as temp_file:
+            for record in records:
+                temp_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            temp_filename = temp_file.name
+        Path(temp_filename).replace(path)
+
+    def _migrate_legacy_file(self, legacy_file: Path) -> None:
+        """Moves a legacy JSON-list history file into the default session shard."""
+        shard = self._shard_path(DEFAULT_SESSION_ID)
+        if not legacy_file.exists() or shard.exists():
+            return
+        try:
+            with legacy_file.open("r", encoding="utf-8") as f:
+                chat_history = json.load(f)
+            if not isinstance(chat_history, list):
+                logger.warning("Invalid legacy chat history format in %s. Skipping migration.", legacy_file)
+                return
+            # Give legacy records increasing timestamps so they sort before any new turn
+            now = time.time()
+            for position, record in enumerate(chat_history):
+                record.setdefault("timestamp", now - (len(chat_history) - position) * 1e-3)
+            self._write_shard(shard, chat_history)
+            legacy_file.replace(legacy_file.with_name(legacy_file.name + ".migrated"))
+            logger.info("Migrated %d chat history entries from %s to %s.", len(chat_history), legacy_file, shard)
+        except Exception as e:
+            logger.error("Failed to migrate chat history from %s: %s", legacy_file, e)
+
+    # --- Reading ---
+
+    def load_chat_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, Any]]:
         """
-        Loads chat history from the session file.
+        Loads the full chat history of a session.
+
+        Args:
+            session_id (str): The session to load.
 
         Returns:
             List[Dict[str, Any]]: A list of chat history records (question-response pairs).
         """
-        if not self.session_file.exists():
-            logger.warning("Chat history file does not exist. Starting with an empty history.")
+        path = self._shard_path(session_id)
+        if not path.exists():
+            return []
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return parse_records(f)
+        except Exception as e:
+            logger.error("Error loading chat history from %s: %s", path, e)
             return []
 
+    def get_last_n_messages(self, n: int, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, str]]:
+        """
+        Retrieves the last N chat history entries by reading the session file backwards
+        from its end, so the cost does not depend on the length of the history.
+
+        Args:
+            n (int): Number of most recent entries to return.
+            session_id (str): The session to read.
+
+        Returns:
+            List[Dict[str, str]]: The last N chat messages, oldest first.
+        """
+        path = self._shard_path(session_id)
+        if n <= 0 or not path.exists():
+            return []
         try:
-            with self.session_file.open("r", encoding="utf-8") as f:
-                chat_history = json.load(f)
-                if not isinstance(chat_history, list):
-                    logger.warning("Invalid chat history format. Resetting to an empty list.")
-                    return []
-                logger.info("Chat history loaded from %s", self.session_file)
-                return chat_history
-        except json.JSONDecodeError:
-            logger.error("Corrupt or invalid JSON in %s. Resetting chat history.", self.session_file)
+            with path.open("rb") as f:
+                position = f.seek(0, os.SEEK_END)
+                data = b""
+                # One more newline than records is needed to be sure the first record is complete
+                while position > 0 and data.count(b"\n") <= n:
+                    step = min(TAIL_BLOCK_SIZE, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
         except Exception as e:
-            logger.error("Error loading chat history from %s: %s", self.session_file, e)
+            logger.error("Error reading chat history from %s: %s", path, e)
+            return []
 
-        return []
+        lines = data.split(b"\n")
+        if position > 0:
+            lines = lines[1:]
+        return parse_records(line.decode("utf-8", errors="replace") for line in lines)[-n:]
 
-    def save_chat_history(self, chat_history: List[Dict[str, Any]]) -> None:
+    def load_summary(self, session_id: str = DEFAULT_SESSION_ID) -> Dict[str, Any]:
         """
-        Saves the chat history to the session file safely using atomic writes.
-        
-        Args:
-            chat_history (List[Dict[str, Any]]): The chat history to save.
+        Loads the running summary of a session's older turns.
+
+        Returns:
+            Dict[str, Any]: `{"summary": str, "until": float}`, where `until` is the timestamp
+                of the last turn folded into the summary.
         """
+        path = self._shard_path(session_id).with_suffix(SUMMARY_SUFFIX)
+        if not path.exists():
+            return {"summary": "", "until": 0.0}
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error("Error loading chat summary from %s: %s", path, e)
+            return {"summary": "", "until": 0.0}
+
+    def save_summary(self, summary: Dict[str, Any], session_id: str = DEFAULT_SESSION_ID) -> None:
+        """Saves the running summary of a session safely using an atomic write."""
+        path = self._shard_path(session_id).with_suffix(SUMMARY_SUFFIX)
         try:
-            # Write to a temporary file first to avoid corruption in case of crashes
-            with tempfile.NamedTemporaryFile("w", delete=False, dir=self.session_file.parent, encoding="utf-8") as temp_file:
-                json.dump(chat_history, temp_file, indent=4, ensure_ascii=False)
+            with tempfile.NamedTemporaryFile("w", delete=False, dir=path.parent, encoding="utf-8") as temp_file:
+                json.dump(summary, temp_file, ensure_ascii=False)
                 temp_filename = temp_file.name
-            
-            # Replace old file atomically
-            Path(temp_filename).replace(self.session_file)
-            logger.info("Chat history successfully saved to %s", self.session_file)
+            Path(temp_filename).replace(path)
         except Exception as e:
-            logger.error("Failed to save chat history to %s: %s", self.session_file, e)
+            logger.error("Failed to save chat summary to %s: %s", path, e)
+
+    def iter_sessions(self) -> Iterator[str]:
+        """Yields the file-name IDs of all stored sessions."""
+        for path in sorted(self.history_dir.glob(f"*{SHARD_SUFFIX}")):
+            yield path.name[:-len(SHARD_SUFFIX)]
 
-    def append_to_history(self, question: str, response: str) -> None:
+    # --- Writing ---
+
+    def append_to_history(self, question: str, response: str, session_id: str = DEFAULT_SESSION_ID) -> None:
         """
-        Appends a new question-response pair to chat history and saves it.
+        Appends a new question-response pair to a session's chat history as one JSONL line.
 
         Args:
             question (str): The user's question.
             response (str): The generated response.
+            session_id (str): The session the turn belongs to.
         """
-        self.chat_history.append({"question": question, "response": response})
-        self.save_chat_history(self.chat_history)
+        path = self._shard_path(session_id)
+        line = json.dumps({"question": question, "response": response, "timestamp": time.time()}, ensure_ascii=False) + "\n"
+        with self._lock(session_id):
+            # A single write on an O_APPEND descriptor never interleaves with other appends
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+                if CHAT_HISTORY_FSYNC:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
 
-    def get_last_n_messages(self, n: int) -> List[Dict[str, str]]:
-        """
-        Retrieves the last N chat history entries.
+            if session_id not in self._turn_counts:
+                self._turn_counts[session_id] = self._count_turns(path)
+            else:
+                self._turn_counts[session_id] += 1
+            needs_compaction = self.max_turns and self._turn_counts[session_id] > self.max_turns * COMPACTION_SLACK
+        if needs_compaction:
+            self._schedule_compaction(session_id)
 
-        Args:
-            n (int): Number of most recent entries to return.
+    def _count_turns(self, path: Path) -> int:
+        with path.open("rb") as f:
+            return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
 
-        Returns:
-            List[Dict[str, str]]: The last N chat messages.
+    def clear_history(self, session_id: str = DEFAULT_SESSION_ID) -> None:
+        """
+        Clears the chat history of a session.
         """
-        return self.chat_history[-n:]
+        with self._lock(session_id):
+            self._shard_path(session_id).unlink(missing_ok=True)
+            self._shard_path(session_id).with_suffix(SUMMARY_SUFFIX).unlink(missing_ok=True)
+            self._turn_counts.pop(session_id, None)
+        logger.info("Chat history of session %s has been cleared.", session_id)
+
+    # --- Compaction ---
+
+    def _schedule_compaction(self, session_id: str) -> None:
+        with self._locks_guard:
+            if session_id in self._compaction_pending:
+                return
+            self._compaction_pending.add(session_id)
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=self._run_compactor, name="chat-history-compactor", daemon=True)
+                self._compactor.start()
+        self._compaction_queue.put(session_id)
+
+    def _run_compactor(self) -> None:
+        while True:
+            session_id = self._compaction_queue.get()
+            try:
+                self.compact(session_id)
+            except Exception as e:
+                logger.error("Failed to compact chat history of session %s: %s", session_id, e)
+            finally:
+                with self._locks_guard:
+                    self._compaction_pending.discard(session_id)
 
-    def clear_history(self) -> None:
+    def compact(self, session_id: str) -> None:
         """
-        Clears the chat history.
+        Rewrites a session file with only its most recent `max_turns` valid records.
+        Appends to the session wait while the file is rewritten.
         """
-        self.chat_history = []
-        self.save_chat_history(self.chat_history)
-        logger.info("Chat history has been cleared.")
+        path = self._shard_path(session_id)
+        with self._lock(session_id):
+            records = self.load_chat_history(session_id)
+            kept = records[-self.max_turns:] if self.max_turns else records
+            self._write_shard(path, kept)
+            self._turn_counts[session_id] = len(kept)
+        logger.info("Compacted chat history of session %s from %d to %d turns.", session_id, len(records), len(kept))
@@ -1,11 +1,10 @@
 import os
 import logging
-from dotenv import load_dotenv
 from pathlib import Path
 from typing import List, Optional
 
-# Load environment variables from .env file
-load_dotenv()
+# Settings are read from the environment when this module is first imported; the entry
+# points (cli.py, api.py, api_async.py, ingest.py) load the .env file before that
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -26,6 +25,14 @@ def get_env_int(key: str, default: int) -> int:
         logger.warning(f"Invalid integer for {key}, using default: {default}")
         return default
 
+def get_env_float(key: str, default: float) -> float:
+    """Fetches an environment variable as a float, with a fallback default."""
+    try:
+        return float(os.getenv(key, default))
+    except ValueError:
+        logger.warning(f"Invalid float for {key}, using default: {default}")
+        return default
+
 def get_env_bool(key: str, default: bool = False) -> bool:
     """Fetches an environment variable as a boolean."""
     value = os.getenv(key, str(default)).strip().lower()
@@ -48,6 +55,16 @@ POSTGRES_PASSWORD = get_env_str("POSTGRES_PASSWORD", "password")
 
 # Dynamically build PostgreSQL connection string
 POSTGRES_CONNECTION_STRING = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+POSTGRES_POOL_SIZE = get_env_int("POSTGRES_POOL_SIZE", 5)
+POSTGRES_MAX_OVERFLOW = get_env_int("POSTGRES_MAX_OVERFLOW", 10)
+POSTGRES_POOL_RECYCLE = get_env_int("POSTGRES_POOL_RECYCLE", 1800)
+# ANN index on the embedding column: "none", "hnsw" or "ivfflat"
+POSTGRES_VECTOR_INDEX = get_env_str("POSTGRES_VECTOR_INDEX", "none").lower()
+POSTGRES_HNSW_M = get_env_int("POSTGRES_HNSW_M", 16)
+POSTGRES_HNSW_EF_CONSTRUCTION = get_env_int("POSTGRES_HNSW_EF_CONSTRUCTION", 64)
+POSTGRES_HNSW_EF_SEARCH = get_env_int("POSTGRES_HNSW_EF_SEARCH", 40)
+POSTGRES_IVFFLAT_LISTS = get_env_int("POSTGRES_IVFFLAT_LISTS", 0)  # 0 derives the list count from the row count
+POSTGRES_IVFFLAT_PROBES = get_env_int("POSTGRES_IVFFLAT_PROBES", 10)
 
 # Chroma Variables
 CHROMA_COLLECTION_NAME = get_env_str("CHROMA_COLLECTION_NAME", "my-collection")
@@ -57,34 +74,140 @@ ELASTICSEARCH_URL = get_env_str("ELASTICSEARCH_URL", "http://elasticsearch:9200"
 ELASTICSEARCH_INDEX = get_env_str("ELASTICSEARCH_INDEX", "my_index")
 ELASTICSEARCH_USERNAME = get_env_str("ELASTICSEARCH_USERNAME", "user")
 ELASTICSEARCH_PASSWORD = get_env_str("ELASTICSEARCH_PASSWORD", "password")
+# Full rebuilds go to a new versioned index, and ELASTICSEARCH_INDEX becomes an alias flipped to it when done
+ELASTICSEARCH_BLUE_GREEN = get_env_bool("ELASTICSEARCH_BLUE_GREEN", True)
+ELASTICSEARCH_BULK_THREADS = get_env_int("ELASTICSEARCH_BULK_THREADS", 4)
+ELASTICSEARCH_BULK_CHUNK_SIZE = get_env_int("ELASTICSEARCH_BULK_CHUNK_SIZE", 500)
+ELASTICSEARCH_SHARDS = get_env_int("ELASTICSEARCH_SHARDS", 1)
+ELASTICSEARCH_REPLICAS = get_env_int("ELASTICSEARCH_REPLICAS", 1)
+ELASTICSEARCH_HNSW_M = get_env_int("ELASTICSEARCH_HNSW_M", 16)
+ELASTICSEARCH_HNSW_EF_CONSTRUCTION = get_env_int("ELASTICSEARCH_HNSW_EF_CONSTRUCTION", 100)
+
+# === Data Storage ===
+DATA_DIR = Path(get_env_str("DATA_DIR", "./data/"))
+SESSION_FILE = get_env_str("SESSION_FILE", str(DATA_DIR / "chat_history.json"))
+CHAT_HISTORY_DIR = get_env_str("CHAT_HISTORY_DIR", str(DATA_DIR / "chat_history"))
+CHAT_HISTORY_MAX_TURNS = get_env_int("CHAT_HISTORY_MAX_TURNS", 1000)
+CHAT_HISTORY_FSYNC = get_env_bool("CHAT_HISTORY_FSYNC", False)
 
 # === Embedding Model Configuration ===
 EMBEDDING_MODEL = get_env_str("EMBEDDING_MODEL", "huggingface").lower()
 EMBEDDING_MODEL_NAME = get_env_str("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+USE_EMBEDDING_CACHE = get_env_bool("USE_EMBEDDING_CACHE", True)
+EMBEDDING_CACHE_FILE = get_env_str("EMBEDDING_CACHE_FILE", str(DATA_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = get_env_int("EMBEDDING_CACHE_MAX_ENTRIES", 500000)
+EMBEDDING_BACKEND = get_env_str("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_MODEL_FILE = get_env_str("EMBEDDING_MODEL_FILE", "")
+EMBEDDING_DEVICE = get_env_str("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_BATCH_SIZE = get_env_int("EMBEDDING_BATCH_SIZE", 64)
+EMBEDDING_BATCH_TOKENS = get_env_int("EMBEDDING_BATCH_TOKENS", 8192)
+EMBEDDING_NORMALIZE = get_env_bool("EMBEDDING_NORMALIZE", True)
+EMBEDDING_WORKERS = get_env_int("EMBEDDING_WORKERS", 0)
 
 # === LLM Model Configuration ===
 LLM_MODEL = get_env_str("LLM_MODEL", "llama3.2")
 LLM_PROVIDER = get_env_str("LLM_PROVIDER", "ollama")
 
-# === Data Storage ===
-DATA_DIR = Path(get_env_str("DATA_DIR", "./data/"))
-DATA_DIR.mkdir(parents=True, exist_ok=True)  # Ensure the directory exists
-SESSION_FILE = get_env_str("SESSION_FILE", str(DATA_DIR / "chat_history.json"))
+# === Conversation History ===
+HISTORY_TOKEN_BUDGET = get_env_int("HISTORY_TOKEN_BUDGET", 1024)
+HISTORY_SUMMARY_TOKENS = get_env_int("HISTORY_SUMMARY_TOKENS", 256)
+HISTORY_WINDOW_TURNS = get_env_int("HISTORY_WINDOW_TURNS", 10)
+USE_HISTORY_SUMMARY = get_env_bool("USE_HISTORY_SUMMARY", True)
+
+# === Async API Serving ===
+LLM_MAX_CONCURRENCY = get_env_int("LLM_MAX_CONCURRENCY", 4)
+LLM_MAX_QUEUE = get_env_int("LLM_MAX_QUEUE", 32)
+REQUEST_TIMEOUT = get_env_int("REQUEST_TIMEOUT", 120)
+BATCH_MAX_CONCURRENCY = get_env_int("BATCH_MAX_CONCURRENCY", 4)
+BATCH_MAX_QUESTIONS = get_env_int("BATCH_MAX_QUESTIONS", 500)
+
+# === Indexing ===
+INDEX_MANIFEST_FILE = get_env_str("INDEX_MANIFEST_FILE", str(DATA_DIR / "index_manifest.json"))
+CHROMA_PERSIST_DIR = get_env_str("CHROMA_PERSIST_DIR", str(DATA_DIR / "chroma"))
+INGEST_BATCH_SIZE = get_env_int("INGEST_BATCH_SIZE", 256)
+INGEST_QUEUE_SIZE = get_env_int("INGEST_QUEUE_SIZE", 8)
+# "build" loads all sources and syncs the index on startup; "attach" only opens the index built by ingest.py
+INDEX_MODE = get_env_str("INDEX_MODE", "build").lower()
+
+# Background refresh of a running process: poll DATA_DIR for changed files every N seconds (0 disables)
+INDEX_WATCH_INTERVAL = get_env_int("INDEX_WATCH_INTERVAL", 0)
+# Scheduled delta sync of remote sources in a running process, in seconds (0 disables; only for enabled sources)
+CONFLUENCE_SYNC_INTERVAL = get_env_int("CONFLUENCE_SYNC_INTERVAL", 0)
+MANTIS_SYNC_INTERVAL = get_env_int("MANTIS_SYNC_INTERVAL", 0)
+HISTORY_SYNC_INTERVAL = get_env_int("HISTORY_SYNC_INTERVAL", 0)
+# Token required in the X-Admin-Token header of /admin endpoints (empty disables the endpoints)
+ADMIN_API_TOKEN = get_env_str("ADMIN_API_TOKEN", "")
+
+# Local (embedded) vector store, used with DB_TYPE=local
+LOCAL_INDEX_DIR = get_env_str("LOCAL_INDEX_DIR", str(DATA_DIR / "local_index"))
+LOCAL_INDEX_TYPE = get_env_str("LOCAL_INDEX_TYPE", "auto").lower()
+LOCAL_HNSW_MIN_VECTORS = get_env_int("LOCAL_HNSW_MIN_VECTORS", 20000)
+LOCAL_HNSW_M = get_env_int("LOCAL_HNSW_M", 16)
+LOCAL_HNSW_EF_SEARCH = get_env_int("LOCAL_HNSW_EF_SEARCH", 64)
+
+# === Local File Loading ===
+LOCAL_FILES_RECURSIVE = get_env_bool("LOCAL_FILES_RECURSIVE", True)
+LOCAL_LOADER_WORKERS = get_env_int("LOCAL_LOADER_WORKERS", os.cpu_count() or 1)
+LOCAL_LOADER_TIMEOUT = get_env_int("LOCAL_LOADER_TIMEOUT", 300)
 
 # === Confluence & Mantis Configuration ===
 CONFLUENCE_API_URL = get_env_str("CONFLUENCE_API_URL")
 CONFLUENCE_API_KEY = get_env_str("CONFLUENCE_API_KEY")
 CONFLUENCE_API_USER = get_env_str("CONFLUENCE_API_USER")
 CONFLUENCE_PAGE_IDS = get_env_list("CONFLUENCE_PAGE_IDS")
+CONFLUENCE_MAX_WORKERS = get_env_int("CONFLUENCE_MAX_WORKERS", 8)
+CONFLUENCE_PARSE_WORKERS = get_env_int("CONFLUENCE_PARSE_WORKERS", os.cpu_count() or 1)
+CONFLUENCE_PREFETCH_PAGES = get_env_int("CONFLUENCE_PREFETCH_PAGES", 4)
+CONFLUENCE_CACHE_FILE = get_env_str("CONFLUENCE_CACHE_FILE", str(DATA_DIR / "confluence_cache.json"))
 
 MANTIS_API_URL = get_env_str("MANTIS_API_URL")
 MANTIS_API_KEY = get_env_str("MANTIS_API_KEY")
+MANTIS_PAGE_SIZE = get_env_int("MANTIS_PAGE_SIZE", 100)
+MANTIS_FILTER_ID = get_env_str("MANTIS_FILTER_ID", "")
+MANTIS_UPDATED_SINCE_PARAM = get_env_str("MANTIS_UPDATED_SINCE_PARAM", "updated_since")
+MANTIS_CACHE_FILE = get_env_str("MANTIS_CACHE_FILE", str(DATA_DIR / "mantis_cache.sqlite3"))
 
 # DOCUMENTS
 USE_HISTORY = get_env_bool("USE_HISTORY", False)
 USE_MANTIS = get_env_bool("USE_MANTIS", False)
 USE_CONFLUENCE = get_env_bool("USE_CONFLUENCE", False)
 USE_MULTIQUERY = get_env_bool("USE_MULTIQUERY", True)
+MULTIQUERY_MODE = get_env_str("MULTIQUERY_MODE", "fusion").lower()
+MULTIQUERY_SKIP_THRESHOLD = get_env_float("MULTIQUERY_SKIP_THRESHOLD", 0.8)
+MULTIQUERY_MAX_WORKERS = get_env_int("MULTIQUERY_MAX_WORKERS", 5)
+MULTIQUERY_TOP_N = get_env_int("MULTIQUERY_TOP_N", 8)
+RETRIEVER_K = get_env_int("RETRIEVER_K", 4)
+USE_RETRIEVAL_CACHE = get_env_bool("USE_RETRIEVAL_CACHE", True)
+RETRIEVAL_CACHE_MAX_ENTRIES = get_env_int("RETRIEVAL_CACHE_MAX_ENTRIES", 1024)
+
+# === Hybrid Search ===
+USE_HYBRID_SEARCH = get_env_bool("USE_HYBRID_SEARCH", True)
+BM25_INDEX_FILE = get_env_str("BM25_INDEX_FILE", str(DATA_DIR / "bm25_index.sqlite3"))
+BM25_MAX_DF_RATIO = get_env_float("BM25_MAX_DF_RATIO", 0.25)
+BM25_K = get_env_int("BM25_K", 8)
+HYBRID_TOP_N = get_env_int("HYBRID_TOP_N", 8)
+
+# === Reranking ===
+USE_RERANKER = get_env_bool("USE_RERANKER", False)
+RERANKER_MODEL = get_env_str("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_FETCH_K = get_env_int("RERANK_FETCH_K", 20)
+RERANK_TOP_N = get_env_int("RERANK_TOP_N", 4)
+RERANK_BATCH_SIZE = get_env_int("RERANK_BATCH_SIZE", 16)
+RERANK_CACHE_MAX_ENTRIES = get_env_int("RERANK_CACHE_MAX_ENTRIES", 10000)
+
+# === Context Packing ===
+USE_CONTEXT_PACKING = get_env_bool("USE_CONTEXT_PACKING", True)
+CONTEXT_TOKEN_BUDGET = get_env_int("CONTEXT_TOKEN_BUDGET", 1500)
+CONTEXT_MAX_CHUNKS = get_env_int("CONTEXT_MAX_CHUNKS", 6)
+CONTEXT_MMR_LAMBDA = get_env_float("CONTEXT_MMR_LAMBDA", 0.7)
+CONTEXT_DUPLICATE_THRESHOLD = get_env_float("CONTEXT_DUPLICATE_THRESHOLD", 0.8)
+
+# === Answer Cache ===
+USE_ANSWER_CACHE = get_env_bool("USE_ANSWER_CACHE", True)
+ANSWER_CACHE_THRESHOLD = get_env_float("ANSWER_CACHE_THRESHOLD", 0.92)
+ANSWER_CACHE_TTL = get_env_int("ANSWER_CACHE_TTL", 86400)
+ANSWER_CACHE_MAX_ENTRIES = get_env_int("ANSWER_CACHE_MAX_ENTRIES", 1000)
+ANSWER_CACHE_FILE = get_env_str("ANSWER_CACHE_FILE", str(DATA_DIR / "answer_cache.sqlite3"))
 
 #OPEN AI
 OPENAI_API_KEY = get_env_str("OPENAI_API_KEY")
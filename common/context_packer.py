@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from common.config import (
+    CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_CHUNKS, CONTEXT_MMR_LAMBDA, CONTEXT_DUPLICATE_THRESHOLD
+)
+from common.conversation_history import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Words per shingle used for near-duplicate detection
+SHINGLE_SIZE = 3
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def shingles(text: str) -> set:
+    """Returns the set of word n-grams of the text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def source_tag(document: Document) -> str:
+    """Returns a short label for the document's source (file name rather than full path)."""
+    source = str(document.metadata.get("source", "unknown"))
+    return os.path.basename(source) or source
+
+
+class ContextPacker:
+    def __init__(
+        self,
+        embeddings=None,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        max_chunks: int = CONTEXT_MAX_CHUNKS,
+        mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+        duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+    ) -> None:
+        """
+        Turns retrieved chunks into the `{context}` prompt input.
+
+        Exact duplicates and near duplicates (word-shingle Jaccard similarity at or above
+        `duplicate_threshold`, e.g. overlapping chunks or copied pages) are dropped, the rest
+        is reordered by maximal marginal relevance to the question, and chunks are taken in
+        that order while they fit the token budget. Each chunk is tagged with its source.
+
+        Args:
+            embeddings: The embedding model used for MMR; without it retrieval order is kept.
+                Chunk and query vectors normally come from the embedding cache.
+            token_budget (int): Maximum tokens of packed context.
+            max_chunks (int): Maximum number of chunks included.
+            mmr_lambda (float): Relevance/diversity trade-off (1 = relevance only).
+            duplicate_threshold (float): Jaccard similarity from which chunks are near duplicates.
+        """
+        self.embeddings = embeddings
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Drops exact and near-duplicate chunks, keeping the first (highest-ranked) copy."""
+        seen_hashes = set()
+        kept: List[Document] = []
+        kept_shingles: List[set] = []
+        for doc in documents:
+            digest = hashlib.sha256(normalize_text(doc.page_content).encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                continue
+            doc_shingles = shingles(doc.page_content)
+            if any(
+                len(doc_shingles & other) / len(doc_shingles | other) >= self.duplicate_threshold
+                for other in kept_shingles
+            ):
+                continue
+            seen_hashes.add(digest)
+            kept.append(doc)
+            kept_shingles.append(doc_shingles)
+        return kept
+
+    def rerank_mmr(self, question: str, documents: List[Document]) -> List[Document]:
+        """Reorders the chunks by maximal marginal relevance to the question."""
+        if self.embeddings is None or len(documents) < 2:
+            return documents
+        try:
+            query_vector = np.array(self.embeddings.embed_query(question), dtype=np.float32)
+            doc_vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        except Exception as e:
+            logger.error(f"Error embedding chunks for MMR, keeping retrieval order: {e}")
+            return documents
+        order = maximal_marginal_relevance(query_vector, doc_vectors, lambda_mult=self.mmr_lambda, k=len(documents))
+        return [documents[i] for i in order]
+
+    def pack(self, question: str, documents: List[Document]) -> str:
+        """
+        Selects and formats the chunks placed in the prompt.
+
+        Args:
+            question (str): The user's question.
+            documents (List[Document]): Retrieved chunks, best first.
+
+        Returns:
+            str: The formatted context.
+        """
+        candidates = self.rerank_mmr(question, self.deduplicate(documents))
+
+        parts = []
+        used = 0
+        for doc in candidates:
+            if len(parts) >= self.max_chunks:
+                break
+            part = f"[{len(parts) + 1}] ({source_tag(doc)})\n{doc.page_content.strip()}"
+            tokens = count_tokens(part)
+            if used + tokens > self.token_budget:
+                continue
+            parts.append(part)
+            used += tokens
+
+        logger.info(
+            "Packed %d of %d retrieved chunks (%d after deduplication) into %d context tokens.",
+            len(parts), len(documents), len(candidates), used
+        )
+        return "\n\n".join(parts)
+
+    def pack_input(self, input: Dict[str, Any]) -> str:
+        """Chain step taking `{"question": ..., "documents": ...}`."""
+        return self.pack(input["question"], input["documents"])
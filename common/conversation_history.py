@@ -0,0 +1,181 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from common.chat_history_manager import ChatHistoryManager, DEFAULT_SESSION_ID
+from common.config import (
+    HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_TOKENS, HISTORY_WINDOW_TURNS, USE_HISTORY_SUMMARY
+)
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when tiktoken is not available
+CHARS_PER_TOKEN = 4
+# Maximum number of fallen-out turns folded into the summary in one LLM call
+SUMMARY_BATCH_TURNS = 20
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_template(
+    """Update the running summary of a conversation between a user and an assistant with the new turns below.
+Keep facts, names, decisions and open questions that later questions may refer to. Reply with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}"""
+)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken is not available, estimating token counts from text length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken, or estimates them from the text length if it is unavailable."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts the text down to at most `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def format_turn(record: Dict[str, Any]) -> str:
+    return f"User: {record.get('question', '')}\nAssistant: {record.get('response', '')}"
+
+
+class ConversationHistory:
+    def __init__(
+        self,
+        chat_manager: ChatHistoryManager,
+        llm=None,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        summary_tokens: int = HISTORY_SUMMARY_TOKENS,
+        window_turns: int = HISTORY_WINDOW_TURNS,
+    ) -> None:
+        """
+        Builds the `{history}` prompt input of a session within a fixed token budget.
+
+        The most recent turns that fit the budget are included verbatim; turns that fall
+        out of that window are folded into a running per-session summary by the LLM in a
+        background thread, so the prompt stays the same size however long a conversation
+        gets and answering never waits for summarization.
+
+        Args:
+            chat_manager (ChatHistoryManager): The store holding the sessions' turns.
+            llm: The LLM used for summarization; summarization is skipped while None.
+            token_budget (int): Total tokens of history (summary included) put in the prompt.
+            summary_tokens (int): Part of the budget reserved for the summary.
+            window_turns (int): Maximum number of recent turns included verbatim.
+        """
+        self.chat_manager = chat_manager
+        self.llm = llm
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens if USE_HISTORY_SUMMARY else 0
+        self.window_turns = window_turns
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _select_window(self, records: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+        """Returns the most recent records whose formatted turns fit the token budget."""
+        window = []
+        used = 0
+        for record in reversed(records):
+            tokens = count_tokens(format_turn(record))
+            if used + tokens > budget:
+                if not window:
+                    # Always keep the latest turn, cut down to the budget
+                    response = truncate_to_tokens(record.get("response", ""), budget - count_tokens(format_turn(dict(record, response=""))))
+                    window.append(dict(record, response=response))
+                break
+            window.append(record)
+            used += tokens
+        window.reverse()
+        return window
+
+    def build_history(self, session_id: str = DEFAULT_SESSION_ID) -> str:
+        """
+        Returns the conversation history of a session formatted for the prompt.
+
+        Args:
+            session_id (str): The session to read.
+
+        Returns:
+            str: The summary of older turns followed by the most recent turns, or an empty string.
+        """
+        records = self.chat_manager.get_last_n_messages(self.window_turns, session_id)
+        if not records:
+            return ""
+
+        summary = ""
+        if self.summary_tokens:
+            summary = truncate_to_tokens(self.chat_manager.load_summary(session_id).get("summary", ""), self.summary_tokens)
+        window = self._select_window(records, self.token_budget - count_tokens(summary))
+
+        parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+        parts.extend(format_turn(record) for record in window)
+        return "\n".join(parts)
+
+    def prepare_input(self, question: str, session_id: str = DEFAULT_SESSION_ID) -> Dict[str, str]:
+        """Returns the chain input for a question asked in a session."""
+        return {"question": question, "history": self.build_history(session_id)}
+
+    def record_turn(self, question: str, answer: str, session_id: str = DEFAULT_SESSION_ID) -> None:
+        """Appends a turn to the session and schedules summarization of turns that fell out of the window."""
+        self.chat_manager.append_to_history(question, answer, session_id)
+        if self.llm is None or not self.summary_tokens:
+            return
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._executor.submit(self._summarize_safely, session_id)
+
+    def _summarize_safely(self, session_id: str) -> None:
+        try:
+            with self._lock:
+                self._pending.discard(session_id)
+            self.summarize(session_id)
+        except Exception as e:
+            logger.error(f"Error summarizing chat history of session {session_id}: {e}")
+
+    def summarize(self, session_id: str = DEFAULT_SESSION_ID) -> None:
+        """Folds the turns that no longer fit the recent window into the session's running summary."""
+        current = self.chat_manager.load_summary(session_id)
+        records = self.chat_manager.get_last_n_messages(self.window_turns + SUMMARY_BATCH_TURNS, session_id)
+        summary = truncate_to_tokens(current.get("summary", ""), self.summary_tokens)
+        window = self._select_window(records[-self.window_turns:], self.token_budget - count_tokens(summary))
+        older = records[:len(records) - len(window)]
+        pending = [record for record in older if record.get("timestamp", 0.0) > current.get("until", 0.0)]
+        if not pending:
+            return
+
+        logger.info("Summarizing %d older turns of session %s...", len(pending), session_id)
+        chain = SUMMARY_PROMPT | self.llm | StrOutputParser()
+        updated = chain.invoke({
+            "summary": current.get("summary") or "(none)",
+            "turns": "\n".join(format_turn(record) for record in pending),
+            "max_words": max(1, self.summary_tokens * 3 // 4),
+        })
+        self.chat_manager.save_summary({"summary": updated.strip(), "until": pending[-1].get("timestamp", 0.0)}, session_id)
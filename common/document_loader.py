@@ -1,10 +1,8 @@
 import logging
-from typing import List
+from typing import Iterable, Iterator, List
 from langchain.schema import Document
 
-from common.documentsExtension.confluence_extension import fetch_confluence_pages
-from common.documentsExtension.mantis_extension import fetch_mantis_issues
-from common.documentsExtension.local_file_extension import load_local_files
+from common.documentsExtension.local_file_extension import iter_local_files
 from common.documentsExtension.chat_history_extension import load_chat_history
 
 from common.config import (
@@ -13,41 +11,97 @@ from common.config import (
 
 logger = logging.getLogger(__name__)
 
-def load_documents() -> List[Document]:
+# Prefix of the source names each remote loader gives its documents
+SOURCE_PREFIXES = {
+    "confluence": "Confluence - ",
+    "mantis": "Mantis - ",
+    "history": "ChatHistory",
+}
+
+def iter_documents() -> Iterator[Document]:
     """
-    Loads documents from various sources.
+    Streams documents from various sources, one source at a time.
 
-    Returns:
-        List[Document]: List of documents fetched from the selected sources.
+    All documents of a source are yielded together, so downstream stages can
+    process the stream without holding the whole corpus in memory.
+
+    Yields:
+        Document: Documents fetched from the selected sources.
     """
     logger.info("Loading documents...")
+    total = 0
 
     # Start by loading local files
     logger.info("Loading documents from local files...")
-    documents = load_local_files()
-    logger.info("Loaded %d documents from local files.", len(documents))
+    local_count = 0
+    for file_path, file_documents in iter_local_files():
+        local_count += len(file_documents)
+        yield from file_documents
+    logger.info("Loaded %d documents from local files.", local_count)
+    total += local_count
 
     # Fetch from Confluence if specified
     if USE_CONFLUENCE:
+        from common.documentsExtension.confluence_extension import fetch_confluence_pages
+
         logger.info("Fetching documents from Confluence...")
         confluence_documents = fetch_confluence_pages()
-        documents.extend(confluence_documents)
+        yield from confluence_documents
         logger.info("Loaded %d documents from Confluence.", len(confluence_documents))
+        total += len(confluence_documents)
 
     # Fetch from Mantis if specified
     if USE_MANTIS:
+        from common.documentsExtension.mantis_extension import iter_mantis_issues
+
         logger.info("Fetching documents from Mantis...")
-        mantis_documents = fetch_mantis_issues()
-        documents.extend(mantis_documents)
-        logger.info("Loaded %d documents from Mantis.", len(mantis_documents))
+        mantis_count = 0
+        for document in iter_mantis_issues():
+            mantis_count += 1
+            yield document
+        logger.info("Loaded %d documents from Mantis.", mantis_count)
+        total += mantis_count
 
     # Fetch chat history if specified
     if USE_HISTORY:
         logger.info("Loading chat history...")
         history_documents = load_chat_history()
-        documents.extend(history_documents)
+        yield from history_documents
         logger.info("Loaded %d chat history documents.", len(history_documents))
+        total += len(history_documents)
+
+    logger.info("Total %d documents loaded.", total)
 
-    logger.info("Total %d documents loaded.", len(documents))
-    
-    return documents
+def load_documents() -> List[Document]:
+    """
+    Loads documents from various sources.
+
+    Returns:
+        List[Document]: List of documents fetched from the selected sources.
+    """
+    return list(iter_documents())
+
+def load_source(name: str) -> Iterable[Document]:
+    """
+    Loads the current documents of a single remote source, for a scheduled sync of that source.
+
+    Args:
+        name (str): One of SOURCE_PREFIXES ("confluence", "mantis", "history").
+
+    Returns:
+        Iterable[Document]: The documents of the source. Confluence and Mantis only download
+            pages and issues changed since their last sync and serve the rest from their caches;
+            Mantis issues are streamed from its cache rather than returned as a list.
+
+    Raises:
+        ValueError: If the source name is unknown.
+    """
+    if name == "confluence":
+        from common.documentsExtension.confluence_extension import fetch_confluence_pages
+        return fetch_confluence_pages()
+    if name == "mantis":
+        from common.documentsExtension.mantis_extension import iter_mantis_issues
+        return iter_mantis_issues()
+    if name == "history":
+        return load_chat_history()
+    raise ValueError(f"Unknown document source: {name}")
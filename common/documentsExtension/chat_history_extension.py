@@ -1,22 +1,19 @@
-import os
-import json
 import logging
 from typing import List
 from langchain.schema import Document
 
-from common.config import SESSION_FILE
+from common.chat_history_manager import ChatHistoryManager
 
 logger = logging.getLogger(__name__)
 
 def load_chat_history() -> List[Document]:
-    """Loads past chat history from a session file."""
+    """Loads past chat history of all sessions."""
     documents = []
-    if os.path.exists(SESSION_FILE):
-        try:
-            with open(SESSION_FILE, 'r') as f:
-                chat_history = json.load(f)
-            for chat in chat_history:
+    try:
+        chat_manager = ChatHistoryManager()
+        for session_id in chat_manager.iter_sessions():
+            for chat in chat_manager.load_chat_history(session_id):
                 documents.append(Document(page_content=chat.get("response", ""), metadata={"source": "ChatHistory"}))
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error loading chat history: {e}")
-    return documents
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"Error loading chat history: {e}")
+    return documents
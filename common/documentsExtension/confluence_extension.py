@@ -1,74 +1,238 @@
-from typing import List
+from typing import Dict, Iterator, List, Optional, Any
 from langchain.schema import Document
+import json
 import logging
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 
 logger = logging.getLogger(__name__)
 
 from common.config import (
-    CONFLUENCE_API_URL, CONFLUENCE_API_KEY, CONFLUENCE_API_USER, CONFLUENCE_PAGE_IDS
+    CONFLUENCE_API_URL, CONFLUENCE_API_KEY, CONFLUENCE_API_USER, CONFLUENCE_PAGE_IDS,
+    CONFLUENCE_MAX_WORKERS, CONFLUENCE_PARSE_WORKERS, CONFLUENCE_PREFETCH_PAGES, CONFLUENCE_CACHE_FILE
 )
 
+PAGE_LIMIT = 25  # Pages per request in pagination mode
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
 def get_confluence_auth():
     """Returns authentication tuple for Confluence API."""
     logger.debug("Retrieving Confluence authentication credentials.")
     return CONFLUENCE_API_USER, CONFLUENCE_API_KEY
 
+def create_confluence_session() -> requests.Session:
+    """
+    Creates a session with a connection pool sized for the fetcher threads, and
+    retries with exponential backoff on 429 and 5xx responses (honouring Retry-After).
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CONFLUENCE_MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.auth = get_confluence_auth()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def load_page_cache() -> Dict[str, Dict[str, Any]]:
+    """Loads the cached version number and text of previously fetched pages."""
+    cache_file = Path(CONFLUENCE_CACHE_FILE)
+    if not cache_file.exists():
+        return {}
+    try:
+        with cache_file.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"Error loading Confluence page cache, refetching all pages: {e}")
+        return {}
+
+def save_page_cache(cache: Dict[str, Dict[str, Any]]) -> None:
+    """Saves the page cache safely using an atomic write."""
+    cache_file = Path(CONFLUENCE_CACHE_FILE)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=cache_file.parent, encoding="utf-8") as temp_file:
+            json.dump(cache, temp_file, ensure_ascii=False)
+            temp_filename = temp_file.name
+        Path(temp_filename).replace(cache_file)
+    except Exception as e:
+        logger.error(f"Failed to save Confluence page cache: {e}")
+
+def html_to_text(html: str) -> str:
+    """Converts Confluence storage-format HTML to plain text."""
+    return BeautifulSoup(html, "html.parser").get_text()
+
+def get_json(session: requests.Session, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Performs a GET request and returns the JSON body, or None if the request failed."""
+    try:
+        response = session.get(url, params=params, timeout=60)
+    except requests.RequestException as e:
+        logger.error(f"Error requesting {url}: {e}")
+        return None
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch {url}. Status: {response.status_code}, Response: {response.text}")
+        return None
+    return response.json()
+
+def get_page_version(page: Dict[str, Any]) -> Optional[int]:
+    """Returns the version number of a Confluence page payload, if present."""
+    return page.get("version", {}).get("number")
+
+def get_page_body(page: Dict[str, Any]) -> str:
+    """Returns the storage-format HTML of a Confluence page payload."""
+    return page.get("body", {}).get("storage", {}).get("value", "")
+
+def iter_listed_pages(session: requests.Session, executor: ThreadPoolExecutor) -> Iterator[Dict[str, Any]]:
+    """
+    Walks the paginated content listing, with each page's body and version, keeping
+    CONFLUENCE_PREFETCH_PAGES listing requests in flight so the next pages are already
+    fetched while one is processed.
+
+    Raises:
+        RuntimeError: If a listing page could not be fetched, i.e. the listing is incomplete.
+    """
+    url = f"{CONFLUENCE_API_URL}/rest/api/content"
+    in_flight = deque()
+    next_start = 0
+
+    def submit_next():
+        nonlocal next_start
+        params = {"start": next_start, "limit": PAGE_LIMIT, "expand": "body.storage,version"}
+        in_flight.append(executor.submit(get_json, session, url, params))
+        next_start += PAGE_LIMIT
+
+    for _ in range(max(1, CONFLUENCE_PREFETCH_PAGES)):
+        submit_next()
+
+    page_number = 0
+    while in_flight:
+        data = in_flight.popleft().result()
+        page_number += 1
+        if data is None:
+            for future in in_flight:
+                future.cancel()
+            raise RuntimeError(f"Failed to fetch Confluence listing page {page_number}.")
+
+        results = data.get("results", [])
+        logger.debug(f"Fetched listing page {page_number} with {len(results)} pages.")
+        yield from results
+
+        if "next" not in data.get("_links", {}) or not results:
+            logger.info("No more pages to fetch. Ending pagination.")
+            break
+        submit_next()
+
+    for future in in_flight:
+        future.cancel()
+
 def fetch_confluence_pages(paginate=False) -> List[Document]:
-    """Fetches Confluence pages using the API."""
-    documents = []
-    auth = get_confluence_auth()
+    """
+    Fetches Confluence pages using the API.
 
+    In pagination mode, the listing requests return each page's body with its version, and
+    only pages whose version changed since the last sync are converted. With page IDs, pages
+    missing from the local page cache are downloaded right away, and cached pages have their
+    version checked first, so only changed ones are downloaded again. Unchanged pages come
+    from the cache. Requests run concurrently over a pooled session, and HTML-to-text
+    conversion runs in a separate process pool.
+    """
     logger.info(f"Starting to fetch Confluence pages with paginate={paginate}.")
 
-    if paginate:
-        url = f"{CONFLUENCE_API_URL}/rest/api/content"
-        start = 0
-        limit = 25  # Adjust as needed
-
-        logger.debug("Pagination mode enabled. Starting with page 1.")
-
-        while True:
-            params = {"start": start, "limit": limit, "expand": "body.storage"}
-            response = requests.get(url, auth=auth, params=params)
-
-            if response.status_code == 200:
-                data = response.json()
-                logger.debug(f"Fetched page {start // limit + 1}. Processing pages...")
-
-                for page in data.get("results", []):
-                    content = page.get("body", {}).get("storage", {}).get("value", "")
-                    soup = BeautifulSoup(content, "html.parser")
-                    lean_text = soup.get_text()
-                    page_id = page.get("id", "unknown")
-                    documents.append(Document(page_content=lean_text, metadata={"source": f"Confluence - {page_id}"}))
-                    logger.info(f"Successfully fetched page {page_id}.")
-                
-                if "next" in data.get("_links", {}):
-                    start += limit  # Move to the next page
-                    logger.debug(f"Moving to next page: {start // limit + 1}")
-                else:
-                    logger.info("No more pages to fetch. Ending pagination.")
-                    break  # No more pages to fetch
+    cache = load_page_cache()
+    session = create_confluence_session()
+    documents = []
+    skipped = 0
+
+    def fetch_body(page_id: str) -> Optional[Dict[str, Any]]:
+        return get_json(session, f"{CONFLUENCE_API_URL}/{page_id}", {"expand": "body.storage,version"})
+
+    with ThreadPoolExecutor(max_workers=CONFLUENCE_MAX_WORKERS) as network, \
+            ProcessPoolExecutor(max_workers=CONFLUENCE_PARSE_WORKERS) as parsers:
+        # The current version of every page. Pages that cannot be checked keep their
+        # cached copy, so a transient failure does not drop them from the index.
+        versions = {}
+        parse_futures = {}
+
+        def parse_if_changed(page_id: str, page: Dict[str, Any]) -> None:
+            nonlocal skipped
+            version = versions[page_id] = get_page_version(page)
+            cached = cache.get(page_id)
+            if version is not None and cached and cached.get("version") == version:
+                skipped += 1
             else:
-                logger.error(f"Failed to fetch Confluence pages. Status: {response.status_code}, Response: {response.text}")
-                break
-    else:
-        # Non-paginated request for specific page IDs
-        logger.debug("Fetching specific Confluence pages without pagination.")
-        for page_id in CONFLUENCE_PAGE_IDS:
-            url = f"{CONFLUENCE_API_URL}/{page_id}?expand=body.storage"
-            response = requests.get(url, auth=auth)
-
-            if response.status_code == 200:
-                content = response.json().get("body", {}).get("storage", {}).get("value", "")
-                soup = BeautifulSoup(content, "html.parser")
-                lean_text = soup.get_text()
-                documents.append(Document(page_content=lean_text, metadata={"source": f"Confluence - {page_id}"}))
+                parse_futures[page_id] = parsers.submit(html_to_text, get_page_body(page))
+
+        if paginate:
+            try:
+                for page in iter_listed_pages(session, network):
+                    parse_if_changed(str(page.get("id", "unknown")), page)
+            except RuntimeError as e:
+                logger.error(f"{e} Keeping cached copies of pages not listed.")
+                for page_id, cached in cache.items():
+                    versions.setdefault(page_id, cached.get("version"))
+        else:
+            logger.debug("Fetching specific Confluence pages without pagination.")
+            body_futures = {
+                network.submit(fetch_body, page_id): page_id
+                for page_id in CONFLUENCE_PAGE_IDS if page_id not in cache
+            }
+            version_futures = {
+                page_id: network.submit(get_json, session, f"{CONFLUENCE_API_URL}/{page_id}", {"expand": "version"})
+                for page_id in CONFLUENCE_PAGE_IDS if page_id in cache
+            }
+            for page_id, future in version_futures.items():
+                page = future.result()
+                if page is None:
+                    logger.error(f"Error fetching Confluence page {page_id}.")
+                    versions[page_id] = cache[page_id].get("version")
+                    continue
+                version = versions[page_id] = get_page_version(page)
+                if version is not None and cache[page_id].get("version") == version:
+                    skipped += 1
+                else:
+                    body_futures[network.submit(fetch_body, page_id)] = page_id
+
+            for future in as_completed(body_futures):
+                page_id = body_futures[future]
+                page = future.result()
+                if page is None:
+                    logger.error(f"Error fetching Confluence page {page_id}.")
+                    continue
+                parse_if_changed(page_id, page)
+
+        for page_id, future in parse_futures.items():
+            try:
+                cache[page_id] = {"version": versions[page_id], "text": future.result()}
                 logger.info(f"Successfully fetched page {page_id}.")
-            else:
-                logger.error(f"Error fetching Confluence page {page_id}. Status: {response.status_code}, Response: {response.text}")
+            except Exception as e:
+                logger.error(f"Error converting Confluence page {page_id}: {e}")
+
+    for page_id, version in versions.items():
+        cached = cache.get(page_id)
+        if cached is None:
+            continue
+        documents.append(Document(
+            page_content=cached["text"],
+            metadata={"source": f"Confluence - {page_id}", "page_id": page_id, "version": version}
+        ))
+
+    save_page_cache({page_id: cache[page_id] for page_id in versions if page_id in cache})
+    session.close()
 
-    logger.info(f"Finished fetching Confluence pages. Total pages fetched: {len(documents)}.")
-    return documents
\ No newline at end of file
+    logger.info(
+        f"Finished fetching Confluence pages. Total pages fetched: {len(documents)} "
+        f"({len(documents) - skipped} downloaded, {skipped} unchanged)."
+    )
+    return documents
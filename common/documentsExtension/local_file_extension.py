@@ -1,11 +1,16 @@
+import multiprocessing
 import os
-import glob
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from langchain_community.document_loaders import (
     TextLoader, UnstructuredHTMLLoader, UnstructuredPDFLoader
 )
-from common.config import DATA_DIR
+from common.config import DATA_DIR, LOCAL_FILES_RECURSIVE, LOCAL_LOADER_WORKERS, LOCAL_LOADER_TIMEOUT
 import logging
-from typing import List
+from typing import Iterator, List, Tuple
 from langchain.schema import Document
 
 logger = logging.getLogger(__name__)
@@ -17,26 +22,156 @@ FILE_LOADERS = {
     ".html": UnstructuredHTMLLoader
 }
 
-def load_local_files() -> List[Document]:
-    """Loads local documents from the filesystem."""
-    documents = []
-    logger.info("Starting to load local files from the directory: %s", DATA_DIR)
+# Loader processes are started from the ingest loader thread of a multithreaded process, where forking is unsafe
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# Extra seconds a worker gets on top of the timeout before it is killed, e.g. when a
+# loader is stuck in C code and never handles SIGALRM, or the worker is still starting
+TIMEOUT_GRACE = 30
+
+def find_local_files(directory=DATA_DIR, recursive=LOCAL_FILES_RECURSIVE) -> List[str]:
+    """
+    Finds all files with a supported extension in the directory.
+
+    Args:
+        directory: The directory to search.
+        recursive (bool): Whether to walk subdirectories as well. Hidden directories are skipped.
+
+    Returns:
+        List[str]: Sorted paths of the supported files found.
+    """
+    files = []
+    for root, dirs, filenames in os.walk(directory):
+        if not recursive:
+            dirs.clear()
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in FILE_LOADERS:
+                files.append(os.path.join(root, filename))
+    return sorted(files)
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("File loading timed out")
+
+def load_file(file_path: str, timeout: int = 0) -> List[Document]:
+    """
+    Loads a single file with the loader registered for its extension.
+
+    Args:
+        file_path (str): Path of the file to load.
+        timeout (int): Seconds after which loading is aborted with a TimeoutError (0 disables it).
+            Only enforced where SIGALRM is available and when running on the main thread,
+            which is always the case inside a loader worker process; `iter_local_files`
+            also kills workers that do not return in time.
+
+    Returns:
+        List[Document]: The documents loaded from the file.
+    """
+    loader_class = FILE_LOADERS[os.path.splitext(file_path)[1].lower()]
+    use_alarm = timeout > 0 and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return loader_class(file_path).load()
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def _kill_pool(executor: ProcessPoolExecutor) -> None:
+    """Terminates the worker processes of a pool, including ones that never return, and shuts it down."""
+    # ProcessPoolExecutor has no public way to stop a running call
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=True, cancel_futures=True)
 
-    for ext, loader_class in FILE_LOADERS.items():
-        logger.info("Processing files with extension: %s", ext)
-        files = glob.glob(os.path.join(DATA_DIR, f"*{ext}"))
-        logger.info("Found %d %s files in the directory.", len(files), ext)
-        
+def iter_local_files(workers: int = LOCAL_LOADER_WORKERS, timeout: int = LOCAL_LOADER_TIMEOUT) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Loads local files, yielding each file's documents as soon as it has been parsed.
+
+    Files are parsed in a process pool and results arrive in completion order, unless there
+    is no timeout and only one worker (or file), in which case they are loaded serially in
+    this process. Each worker parses one file at a time; a worker that has not returned
+    TIMEOUT_GRACE seconds after the timeout is killed, and the pool restarted. Files that
+    fail or exceed the timeout are logged and skipped.
+
+    Args:
+        workers (int): Number of loader processes. 1 loads one file at a time.
+        timeout (int): Per-file timeout in seconds (0 disables it).
+
+    Yields:
+        Tuple[str, List[Document]]: The file path and the documents loaded from it.
+    """
+    files = find_local_files()
+    logger.info("Found %d supported files in %s.", len(files), DATA_DIR)
+
+    if timeout <= 0 and (workers <= 1 or len(files) <= 1):
         for file_path in files:
             try:
                 logger.info("Loading file: %s", file_path)
-                loader = loader_class(file_path) if callable(loader_class) else loader_class(file_path)
-                loaded_documents = loader.load()
-                documents.extend(loaded_documents)
-                logger.info("Successfully loaded %d documents from file: %s", len(loaded_documents), file_path)
+                yield file_path, load_file(file_path)
             except Exception as e:
                 logger.error(f"Error loading file {file_path}: {e}")
+        return
+    if not files:
+        return
+
+    pool_size = max(1, min(workers, len(files)))
+    logger.info("Loading files with %d worker processes...", pool_size)
+    pending = deque(files)
+    in_flight = {}
+    executor = ProcessPoolExecutor(max_workers=pool_size, mp_context=POOL_CONTEXT)
+    try:
+        while pending or in_flight:
+            # Only as many files as workers are submitted, so each starts parsing right away
+            while pending and len(in_flight) < pool_size:
+                file_path = pending.popleft()
+                deadline = time.monotonic() + timeout + TIMEOUT_GRACE if timeout > 0 else None
+                in_flight[executor.submit(load_file, file_path, timeout)] = (file_path, deadline)
+
+            deadlines = [deadline for _, deadline in in_flight.values() if deadline is not None]
+            wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(in_flight, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, _ = in_flight.pop(future)
+                try:
+                    yield file_path, future.result()
+                except Exception as e:
+                    logger.error(f"Error loading file {file_path}: {e}")
+
+            now = time.monotonic()
+            expired = [
+                future for future, (_, deadline) in in_flight.items()
+                if deadline is not None and deadline <= now and not future.done()
+            ]
+            if expired:
+                for future in expired:
+                    file_path, _ = in_flight.pop(future)
+                    logger.error(f"Error loading file {file_path}: the loader did not return in time. Skipping it.")
+                # The other files in flight are loaded again by a fresh pool
+                pending.extendleft(reversed([file_path for file_path, _ in in_flight.values()]))
+                in_flight.clear()
+                _kill_pool(executor)
+                executor = ProcessPoolExecutor(max_workers=pool_size, mp_context=POOL_CONTEXT)
+    finally:
+        if in_flight:
+            # The consumer stopped early; files still being parsed are not needed
+            _kill_pool(executor)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def load_local_files() -> List[Document]:
+    """Loads local documents from the filesystem."""
+    documents = []
+    logger.info("Starting to load local files from the directory: %s", DATA_DIR)
+
+    for file_path, loaded_documents in iter_local_files():
+        documents.extend(loaded_documents)
+        logger.info("Successfully loaded %d documents from file: %s", len(loaded_documents), file_path)
 
     logger.info("Finished loading local files. Total documents loaded: %d", len(documents))
-    
+
     return documents
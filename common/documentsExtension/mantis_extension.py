@@ -1,27 +1,165 @@
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional
 from langchain.schema import Document
+from datetime import datetime
+from pathlib import Path
 import logging
+import sqlite3
 import requests
 
 logger = logging.getLogger(__name__)
 
 from common.config import (
-    MANTIS_API_URL, MANTIS_API_KEY
+    MANTIS_API_URL, MANTIS_API_KEY, MANTIS_PAGE_SIZE, MANTIS_FILTER_ID, MANTIS_UPDATED_SINCE_PARAM,
+    MANTIS_CACHE_FILE
 )
 
 
-def fetch_mantis_issues() -> List[Document]:
-    """Fetches issues from Mantis API."""
-    documents = []
-    headers = {"Authorization": f"Bearer {MANTIS_API_KEY}"}
+def open_issue_cache() -> sqlite3.Connection:
+    """Opens the SQLite cache holding the last-updated watermark and the text of previously fetched issues."""
+    cache_file = Path(MANTIS_CACHE_FILE)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(cache_file), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS issues (id TEXT PRIMARY KEY, updated_at TEXT, text TEXT NOT NULL)"
+    )
+    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    connection.commit()
+    return connection
 
-    response = requests.get(f"{MANTIS_API_URL}/issues", headers=headers)
-    if response.status_code == 200:
-        issues = response.json()
-        for issue in issues:
-            content = f"{issue.get('summary', 'No summary')}\n{issue.get('description', 'No description')}"
-            documents.append(Document(page_content=content, metadata={"source": "Mantis"}))
-    else:
-        logger.error(f"Error fetching Mantis issues. Status: {response.status_code}, Response: {response.text}")
 
-    return documents
\ No newline at end of file
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parses a Mantis ISO-8601 timestamp, returning None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def iter_mantis_pages(session: requests.Session, watermark: Optional[str]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Requests issues page by page, yielding each page's issues so only one
+    page of the response is held in memory at a time.
+
+    Args:
+        session (requests.Session): The authenticated session.
+        watermark (Optional[str]): Last update time of the previous sync, sent as the
+            MANTIS_UPDATED_SINCE_PARAM query parameter so only newer issues are returned.
+    """
+    page = 1
+    while True:
+        params = {"page_size": MANTIS_PAGE_SIZE, "page": page}
+        if MANTIS_FILTER_ID:
+            params["filter_id"] = MANTIS_FILTER_ID
+        if watermark and MANTIS_UPDATED_SINCE_PARAM:
+            params[MANTIS_UPDATED_SINCE_PARAM] = watermark
+
+        response = session.get(f"{MANTIS_API_URL}/issues", params=params, timeout=60)
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching Mantis issues page {page}. Status: {response.status_code}, Response: {response.text}")
+
+        data = response.json()
+        issues = data.get("issues", []) if isinstance(data, dict) else data
+        if not issues:
+            return
+
+        logger.debug(f"Fetched Mantis issues page {page} with {len(issues)} issues.")
+        yield issues
+
+        if len(issues) < MANTIS_PAGE_SIZE:
+            return
+        page += 1
+
+
+def sync_issue_cache(connection: sqlite3.Connection) -> int:
+    """
+    Stores the issues updated since the last sync in the issue cache.
+
+    The watermark is sent with each request, and paging also stops at the first page
+    reaching issues older than it, as Mantis lists issues by last update, newest first.
+    Issues missing from the walk are never removed from the cache: page-number paging
+    can skip an issue while others are updated or deleted.
+
+    Args:
+        connection (sqlite3.Connection): The opened issue cache.
+
+    Returns:
+        int: The number of new or updated issues.
+    """
+    row = connection.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+    watermark_value = row[0] if row else None
+    watermark = parse_timestamp(watermark_value)
+    new_watermark = watermark
+    updated = 0
+
+    with requests.Session() as session:
+        session.headers.update({"Authorization": f"Bearer {MANTIS_API_KEY}"})
+        try:
+            for issues in iter_mantis_pages(session, watermark_value):
+                page_oldest = None
+                rows = []
+                for issue in issues:
+                    updated_at = issue.get("updated_at")
+                    updated_time = parse_timestamp(updated_at)
+                    if updated_time and (page_oldest is None or updated_time < page_oldest):
+                        page_oldest = updated_time
+                    if updated_time and (new_watermark is None or updated_time > new_watermark):
+                        new_watermark = updated_time
+                    rows.append((
+                        str(issue.get("id", "unknown")), updated_at,
+                        f"{issue.get('summary', 'No summary')}\n{issue.get('description', 'No description')}",
+                    ))
+
+                before = connection.total_changes
+                connection.executemany(
+                    "INSERT INTO issues (id, updated_at, text) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at, text = excluded.text "
+                    "WHERE issues.updated_at IS NOT excluded.updated_at OR excluded.updated_at IS NULL",
+                    rows
+                )
+                updated += connection.total_changes - before
+                connection.commit()
+
+                if watermark and page_oldest and page_oldest < watermark:
+                    logger.info("Reached issues older than the last sync. Stopping pagination.")
+                    break
+        except (requests.RequestException, RuntimeError) as e:
+            # Unfetched issues may still be newer than the old watermark, so keep it
+            logger.error(f"Error fetching Mantis issues, keeping cached issues: {e}")
+            return updated
+
+    if new_watermark and new_watermark != watermark:
+        connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (new_watermark.isoformat(),)
+        )
+        connection.commit()
+    return updated
+
+
+def iter_mantis_issues() -> Iterator[Document]:
+    """
+    Fetches issues from Mantis API.
+
+    Only issues updated after the persisted watermark are requested and rebuilt; all
+    issues are then yielded one at a time from the local issue cache, so neither the
+    API responses nor the cached texts are held in memory at once.
+
+    Yields:
+        Document: One document per issue.
+    """
+    connection = open_issue_cache()
+    try:
+        updated = sync_issue_cache(connection)
+        count = 0
+        for issue_id, updated_at, text in connection.execute("SELECT id, updated_at, text FROM issues"):
+            count += 1
+            yield Document(
+                page_content=text,
+                metadata={"source": f"Mantis - {issue_id}", "issue_id": issue_id, "updated_at": updated_at}
+            )
+        logger.info(f"Fetched {count} Mantis issues ({updated} new or updated since the last sync).")
+    finally:
+        connection.close()
@@ -0,0 +1,193 @@
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from elasticsearch import Elasticsearch, helpers
+from langchain_core.documents import Document
+
+from common.config import (
+    ELASTICSEARCH_URL, ELASTICSEARCH_INDEX, ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD,
+    ELASTICSEARCH_BULK_THREADS, ELASTICSEARCH_BULK_CHUNK_SIZE, ELASTICSEARCH_SHARDS, ELASTICSEARCH_REPLICAS,
+    ELASTICSEARCH_HNSW_M, ELASTICSEARCH_HNSW_EF_CONSTRUCTION
+)
+from common.embedding_engine import produces_unit_vectors
+
+logger = logging.getLogger(__name__)
+
+# Field names used by langchain's ElasticsearchStore
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+
+_client: Optional[Elasticsearch] = None
+_client_lock = threading.Lock()
+
+
+def get_elasticsearch_client() -> Elasticsearch:
+    """Returns the process-wide Elasticsearch client, shared by the vector store and index management."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Elasticsearch(ELASTICSEARCH_URL, basic_auth=(ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD))
+        return _client
+
+
+def index_body(dimensions: int, loading: bool = False) -> Dict[str, Any]:
+    """
+    Returns the settings and mappings of a vector index, with the embedding stored as an
+    HNSW-indexed `dense_vector` for approximate kNN search (by dot product for unit vectors).
+
+    Args:
+        dimensions (int): The vector size of the embedding model.
+        loading (bool): Disable refreshes and replicas for a bulk load; `publish` restores them.
+    """
+    return {
+        "settings": {
+            "number_of_shards": ELASTICSEARCH_SHARDS,
+            "number_of_replicas": 0 if loading else ELASTICSEARCH_REPLICAS,
+            "refresh_interval": "-1" if loading else "1s",
+        },
+        "mappings": {
+            "properties": {
+                TEXT_FIELD: {"type": "text"},
+                "metadata": {"type": "object"},
+                VECTOR_FIELD: {
+                    "type": "dense_vector",
+                    "dims": dimensions,
+                    "index": True,
+                    # Unit vectors rank the same by dot product as by cosine, without normalizing per comparison
+                    "similarity": "dot_product" if produces_unit_vectors() else "cosine",
+                    "index_options": {
+                        "type": "hnsw",
+                        "m": ELASTICSEARCH_HNSW_M,
+                        "ef_construction": ELASTICSEARCH_HNSW_EF_CONSTRUCTION,
+                    },
+                },
+            }
+        },
+    }
+
+
+def get_alias_targets(client: Elasticsearch, alias: str = ELASTICSEARCH_INDEX) -> List[str]:
+    """Returns the indices behind the alias, or an empty list if it is not an alias."""
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return list(client.indices.get_alias(name=alias).keys())
+
+
+class ElasticsearchBulkWriter:
+    def __init__(self, client: Elasticsearch, index_name: str, embedding) -> None:
+        """
+        Minimal write side of a vector store that embeds chunks and indexes them with
+        `parallel_bulk`, in the document format of langchain's ElasticsearchStore.
+
+        Each call is split into one bulk request per thread (at most ELASTICSEARCH_BULK_CHUNK_SIZE
+        documents each), so an ingest batch is sent over all ELASTICSEARCH_BULK_THREADS. Chunks
+        are embedded one bulk request at a time while earlier requests are being indexed.
+
+        Args:
+            client (Elasticsearch): The client to write with.
+            index_name (str): The concrete index written to.
+            embedding: The embedding model.
+        """
+        self.client = client
+        self.index_name = index_name
+        self.embeddings = embedding
+
+    @staticmethod
+    def _chunk_size(count: int) -> int:
+        """Returns the bulk request size that spreads `count` actions over all threads."""
+        return max(1, min(ELASTICSEARCH_BULK_CHUNK_SIZE, math.ceil(count / ELASTICSEARCH_BULK_THREADS)))
+
+    def _bulk(self, actions, chunk_size: int) -> None:
+        failures = 0
+        for ok, info in helpers.parallel_bulk(
+            self.client, actions, thread_count=ELASTICSEARCH_BULK_THREADS,
+            chunk_size=chunk_size, raise_on_error=False
+        ):
+            if not ok and info.get("delete", {}).get("status") != 404:
+                failures += 1
+                if failures == 1:
+                    logger.error("Bulk indexing failed for a document: %s", info)
+        if failures:
+            raise ValueError(f"Bulk indexing failed for {failures} documents.")
+
+    def _index_actions(self, documents: List[Document], ids: List[str], chunk_size: int) -> Iterator[Dict[str, Any]]:
+        """Yields index actions, embedding the documents lazily one bulk request at a time."""
+        for start in range(0, len(documents), chunk_size):
+            batch = documents[start:start + chunk_size]
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in batch])
+            for chunk_id, doc, vector in zip(ids[start:start + chunk_size], batch, vectors):
+                yield {
+                    "_op_type": "index",
+                    "_index": self.index_name,
+                    "_id": chunk_id,
+                    TEXT_FIELD: doc.page_content,
+                    VECTOR_FIELD: vector,
+                    "metadata": doc.metadata,
+                }
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> List[str]:
+        chunk_size = self._chunk_size(len(documents))
+        # parallel_bulk consumes the actions from its own thread, so embedding overlaps indexing
+        self._bulk(self._index_actions(documents, ids, chunk_size), chunk_size)
+        return ids
+
+    def delete(self, ids: List[str]) -> None:
+        self._bulk(
+            ({"_op_type": "delete", "_index": self.index_name, "_id": chunk_id} for chunk_id in ids),
+            self._chunk_size(len(ids))
+        )
+
+
+class BlueGreenIndexBuild:
+    def __init__(self, embedding, dimensions: int, alias: str = ELASTICSEARCH_INDEX) -> None:
+        """
+        Builds a complete index next to the one being served and switches over atomically.
+
+        A new versioned index (`<alias>-<timestamp>`) is created with refreshes and replicas
+        disabled and filled through `writer`. `publish()` restores the settings, points the
+        alias at the new index in a single alias update, and deletes the previous index, so
+        queries never see an empty or partial index. `abort()` drops the new index instead.
+
+        Args:
+            embedding: The embedding model.
+            dimensions (int): The vector size of the embedding model.
+            alias (str): The name queries use; a concrete index of that name is replaced by the alias.
+        """
+        self.client = get_elasticsearch_client()
+        self.alias = alias
+        self.index_name = f"{alias}-{time.strftime('%Y%m%d%H%M%S')}"
+        logger.info("Creating Elasticsearch index %s for a blue/green rebuild of %s...", self.index_name, alias)
+        self.client.indices.create(index=self.index_name, **index_body(dimensions, loading=True))
+        self.writer = ElasticsearchBulkWriter(self.client, self.index_name, embedding)
+
+    def publish(self) -> None:
+        """Makes the new index searchable, flips the alias to it, and deletes the old index."""
+        self.client.indices.put_settings(
+            index=self.index_name,
+            settings={"index": {"refresh_interval": "1s", "number_of_replicas": ELASTICSEARCH_REPLICAS}},
+        )
+        self.client.indices.refresh(index=self.index_name)
+
+        previous = get_alias_targets(self.client, self.alias)
+        actions: List[Dict[str, Any]] = [{"add": {"index": self.index_name, "alias": self.alias}}]
+        if not previous and self.client.indices.exists(index=self.alias):
+            # A concrete index still has the alias name; drop it in the same atomic update
+            actions.append({"remove_index": {"index": self.alias}})
+        actions.extend({"remove": {"index": index, "alias": self.alias}} for index in previous)
+        self.client.indices.update_aliases(actions=actions)
+        logger.info("Alias %s now points to %s.", self.alias, self.index_name)
+
+        for index in previous:
+            self.client.indices.delete(index=index, ignore_unavailable=True)
+            logger.info("Deleted previous Elasticsearch index %s.", index)
+
+    def abort(self) -> None:
+        """Deletes the unpublished index, leaving the served one untouched."""
+        try:
+            self.client.indices.delete(index=self.index_name, ignore_unavailable=True)
+            logger.info("Dropped unpublished Elasticsearch index %s.", self.index_name)
+        except Exception as e:
+            logger.error(f"Error dropping unpublished Elasticsearch index {self.index_name}: {e}")
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from common.config import EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def hash_text(text: str) -> str:
+    """Generate a SHA-256 hash of the text used as the cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache_file: str = EMBEDDING_CACHE_FILE,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ) -> None:
+        """
+        Wraps an embedding model with a persistent on-disk cache.
+
+        Vectors are stored as float32 blobs in SQLite, keyed by (model name, SHA-256 of the text),
+        and evicted least-recently-used once the cache grows beyond `max_entries`.
+
+        Args:
+            embeddings (Embeddings): The embedding model to compute cache misses with.
+            model_name (str): Name identifying the model, so vectors of different models never mix.
+            cache_file (str): Path of the SQLite cache file.
+            max_entries (int): Maximum number of cached vectors.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_file = Path(cache_file)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._connection.commit()
+        logger.info("Embedding cache opened at %s for model %s.", self.cache_file, self.model_name)
+
+    def _lookup(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetches cached vectors for the given hashes and marks them as recently used."""
+        found: Dict[str, List[float]] = {}
+        for start in range(0, len(text_hashes), LOOKUP_BATCH_SIZE):
+            batch = text_hashes[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch],
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = array("f", blob).tolist()
+
+        if found:
+            now = time.time()
+            self._connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, text_hash) for text_hash in found],
+            )
+        return found
+
+    def _store(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        """Writes new vectors to the cache and evicts the least recently used entries if needed."""
+        now = time.time()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            [(model, text_hash, array("f", vector).tobytes(), now) for text_hash, vector in vectors.items()],
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        """Removes least recently used entries so the cache stays within `max_entries`."""
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,),
+        )
+        logger.info("Evicted %d least recently used entries from the embedding cache.", overflow)
+
+    def _embed_cached(self, model: str, texts: List[str], compute) -> List[List[float]]:
+        """Returns vectors for the texts, calling `compute` only for the distinct texts not cached yet."""
+        text_hashes = [hash_text(text) for text in texts]
+
+        with self._lock:
+            vectors = self._lookup(model, list(set(text_hashes)))
+            self._connection.commit()
+
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+
+        if missing:
+            new_vectors = dict(zip(missing.keys(), compute(list(missing.values()))))
+            vectors.update(new_vectors)
+            with self._lock:
+                self._store(model, new_vectors)
+                self._connection.commit()
+
+        misses = sum(1 for text_hash in text_hashes if text_hash in missing)
+        with self._lock:
+            self.hits += len(texts) - misses
+            self.misses += misses
+        logger.debug("Embedding cache: %d hits, %d misses for %d texts.", len(texts) - misses, misses, len(texts))
+
+        return [vectors[text_hash] for text_hash in text_hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds a list of texts, computing only the ones missing from the cache.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[List[float]]: One vector per input text, in input order.
+        """
+        return self._embed_cached(self.model_name, texts, self.embeddings.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries in one batch call, using the cache when possible.
+        Misses are computed with `embed_documents`, which the supported models
+        (Hugging Face, OpenAI) compute identically to `embed_query`.
+        """
+        return self._embed_cached(f"{self.model_name}#query", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query text, using the cache when possible."""
+        return self._embed_cached(
+            f"{self.model_name}#query", [text],
+            lambda missing: [self.embeddings.embed_query(missing[0])]
+        )[0]
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the hit rate since the cache was opened."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def log_stats(self) -> None:
+        """Logs the current hit/miss counters."""
+        stats = self.get_stats()
+        logger.info(
+            "Embedding cache: %d hits, %d misses (hit rate %.1f%%).",
+            stats["hits"], stats["misses"], stats["hit_rate"] * 100
+        )
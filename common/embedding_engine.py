@@ -0,0 +1,178 @@
+import atexit
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from common.config import (
+    EMBEDDING_MODEL, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_MODEL_FILE, EMBEDDING_DEVICE,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS, EMBEDDING_NORMALIZE, EMBEDDING_WORKERS
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "openvino")
+
+
+def embedding_namespace() -> str:
+    """
+    Returns a name identifying the vectors produced by the configured embedding setup.
+    Backends, quantized model files and normalization change the vectors, so cached
+    vectors and indexes are only reused while this name stays the same.
+    """
+    parts = [EMBEDDING_MODEL, EMBEDDING_MODEL_NAME]
+    if EMBEDDING_MODEL == "huggingface":
+        parts.append(EMBEDDING_BACKEND)
+        if EMBEDDING_MODEL_FILE:
+            parts.append(EMBEDDING_MODEL_FILE)
+        if EMBEDDING_NORMALIZE:
+            parts.append("normalized")
+    return ":".join(parts)
+
+
+def produces_unit_vectors() -> bool:
+    """Whether the configured embedding model returns unit-length vectors, so inner product equals cosine similarity."""
+    return EMBEDDING_MODEL == "huggingface" and EMBEDDING_NORMALIZE
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        backend: str = EMBEDDING_BACKEND,
+        model_file: str = EMBEDDING_MODEL_FILE,
+        device: str = EMBEDDING_DEVICE,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        normalize: bool = EMBEDDING_NORMALIZE,
+        workers: int = EMBEDDING_WORKERS,
+    ) -> None:
+        """
+        Embeds texts with a sentence-transformers model, tuned for bulk ingestion on CPU.
+
+        Texts are sorted by token length and grouped into batches whose padded size stays within
+        `batch_tokens`, so short chunks are encoded in large batches and long chunks are not
+        padded to the length of unrelated ones. With `workers` set, large calls are spread over
+        a pool of encoding processes instead. The model can run on the ONNX Runtime or OpenVINO
+        backend, e.g. from a quantized int8 file of the model repository.
+
+        Args:
+            model_name (str): Hugging Face name or local path of the model.
+            backend (str): "torch", "onnx" or "openvino".
+            model_file (str): ONNX/OpenVINO file within the model repository, e.g.
+                "onnx/model_qint8_avx512_vnni.onnx". Defaults to the unquantized export.
+            device (str): Device of the model, e.g. "cpu".
+            batch_size (int): Maximum texts per batch.
+            batch_tokens (int): Maximum padded tokens (texts x longest text) per batch.
+            normalize (bool): Return unit-length vectors, so stores can rank by inner product.
+            workers (int): Encoding processes for calls of more than `batch_size` texts (0 disables the pool).
+
+        Raises:
+            ValueError: If the backend is not supported.
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        from sentence_transformers import SentenceTransformer
+
+        logger.info(
+            "Loading sentence-transformers model %s (%s backend%s) on %s...",
+            model_name, backend, f", {model_file}" if model_file else "", device
+        )
+        self.model = SentenceTransformer(
+            model_name, device=device, backend=backend,
+            model_kwargs={"file_name": model_file} if model_file else None
+        )
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.normalize = normalize
+        self.workers = workers
+        self._pool: Optional[Dict[str, Any]] = None
+        self._pool_lock = threading.Lock()
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Returns the number of tokens of each text after truncation to the model's maximum length."""
+        encoded = self.model.tokenizer(texts, truncation=True, max_length=self.model.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _batches(self, order: List[int], lengths: List[int]) -> List[List[int]]:
+        """Groups text positions, sorted longest first, into batches within the token budget."""
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        for index in order:
+            # The first text of a batch is its longest, so it sets the padded length
+            if batch and (len(batch) >= self.batch_size or (len(batch) + 1) * lengths[batch[0]] > self.batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _get_pool(self) -> Dict[str, Any]:
+        with self._pool_lock:
+            if self._pool is None:
+                logger.info("Starting %d embedding worker processes...", self.workers)
+                self._pool = self.model.start_multi_process_pool(target_devices=[self.model.device.type] * self.workers)
+                atexit.register(self.close)
+            return self._pool
+
+    def close(self) -> None:
+        """Stops the worker processes, if started."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        """
+        Embeds the texts in length-sorted batches.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: One row per input text, in input order.
+        """
+        import numpy as np
+
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda index: lengths[index], reverse=True)
+
+        # Queries and small calls stay in-process, as handing them to the pool costs more than it saves
+        if self.workers > 0 and len(texts) > self.batch_size:
+            # Each chunk is one batch of similar lengths, handed to whichever worker is idle
+            sorted_vectors = self.model.encode_multi_process(
+                [texts[index] for index in order], self._get_pool(), batch_size=self.batch_size,
+                chunk_size=self.batch_size, normalize_embeddings=self.normalize
+            )
+            vectors = np.empty_like(sorted_vectors)
+            vectors[order] = sorted_vectors
+            return vectors
+
+        vectors = None
+        for batch in self._batches(order, lengths):
+            batch_vectors = self.model.encode(
+                [texts[index] for index in batch], batch_size=len(batch),
+                normalize_embeddings=self.normalize, convert_to_numpy=True, show_progress_bar=False
+            )
+            if vectors is None:
+                vectors = np.empty((len(texts), batch_vectors.shape[1]), dtype=batch_vectors.dtype)
+            vectors[batch] = batch_vectors
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a list of texts, returning one vector per text in input order."""
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query text."""
+        return self.model.encode(
+            text, normalize_embeddings=self.normalize, convert_to_numpy=True, show_progress_bar=False
+        ).tolist()
@@ -0,0 +1,150 @@
+import json
+import hashlib
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Any
+
+from common.config import INDEX_MANIFEST_FILE
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT_VERSION = 1
+
+# (manifest mtime, index version) of the last manifest read by get_index_version()
+_version_cache = (None, 0)
+
+
+def hash_documents(documents) -> str:
+    """Generate a SHA-256 hash over the content of all documents belonging to one source."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    def __init__(self, signature: str, manifest_file: str = INDEX_MANIFEST_FILE) -> None:
+        """
+        Tracks which sources and chunks are already embedded in the vector store.
+
+        Args:
+            signature (str): Identifies the vector store and embedding setup the manifest belongs to.
+                A manifest written for a different signature is discarded.
+            manifest_file (str): Path of the JSON file the manifest is persisted to.
+        """
+        self.manifest_file: Path = Path(manifest_file)
+        self.signature: str = signature
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.version: int = 0
+        self.is_fresh: bool = True
+        self.load()
+
+    def load(self) -> None:
+        """
+        Loads the manifest from disk. Leaves the manifest empty (fresh) if the file is missing,
+        corrupt, or was written for a different vector store/embedding signature.
+        """
+        if not self.manifest_file.exists():
+            logger.info("No index manifest found at %s. A full index build is required.", self.manifest_file)
+            return
+
+        try:
+            with self.manifest_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error("Could not read index manifest %s: %s. Rebuilding the index.", self.manifest_file, e)
+            return
+
+        if data.get("format") != MANIFEST_FORMAT_VERSION or data.get("signature") != self.signature:
+            logger.warning("Index manifest does not match the current vector store configuration. Rebuilding the index.")
+            return
+
+        self.sources = data.get("sources", {})
+        self.version = data.get("version", 0)
+        self.is_fresh = False
+        logger.info("Index manifest loaded with %d sources.", len(self.sources))
+
+    def save(self) -> None:
+        """Saves the manifest safely using an atomic write."""
+        data = {
+            "format": MANIFEST_FORMAT_VERSION,
+            "signature": self.signature,
+            "version": self.version,
+            "sources": self.sources,
+        }
+        try:
+            self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", delete=False, dir=self.manifest_file.parent, encoding="utf-8") as temp_file:
+                json.dump(data, temp_file, ensure_ascii=False)
+                temp_filename = temp_file.name
+
+            Path(temp_filename).replace(self.manifest_file)
+            self.is_fresh = False
+            logger.info("Index manifest saved to %s", self.manifest_file)
+        except Exception as e:
+            logger.error("Failed to save index manifest to %s: %s", self.manifest_file, e)
+
+    def reset(self) -> None:
+        """Forgets all tracked sources, e.g. after the vector store has been recreated."""
+        self.sources = {}
+
+    def bump_version(self) -> None:
+        """
+        Marks the index as changed. Versions are millisecond timestamps (or the next integer),
+        so they keep increasing even across a deleted manifest and a full rebuild.
+        """
+        self.version = max(self.version + 1, int(time.time() * 1000))
+
+    def source_hash(self, source: str) -> str:
+        """Returns the recorded document hash for a source, or an empty string if unknown."""
+        return self.sources.get(source, {}).get("hash", "")
+
+    def set_source(self, source: str, document_hash: str, chunk_ids: Iterable[str]) -> None:
+        """Records the document hash and chunk IDs currently indexed for a source."""
+        self.sources[source] = {"hash": document_hash, "chunks": sorted(set(chunk_ids))}
+
+    def remove_source(self, source: str) -> None:
+        """Stops tracking a source."""
+        self.sources.pop(source, None)
+
+    def source_names(self) -> List[str]:
+        """Returns all tracked source names."""
+        return list(self.sources)
+
+    def chunk_ids(self) -> Set[str]:
+        """Returns the IDs of all chunks referenced by at least one tracked source."""
+        ids: Set[str] = set()
+        for entry in self.sources.values():
+            ids.update(entry.get("chunks", []))
+        return ids
+
+
+def get_index_version(manifest_file: str = INDEX_MANIFEST_FILE) -> int:
+    """
+    Returns the version of the index as last saved to the manifest, so caches can tell
+    when the indexed documents changed, including changes made by another process.
+    The manifest is only re-read when its modification time changes.
+    """
+    global _version_cache
+    path = Path(manifest_file)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+    cached_mtime, cached_version = _version_cache
+    if mtime == cached_mtime:
+        return cached_version
+
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            version = json.load(f).get("version", 0)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error("Could not read index version from %s: %s", path, e)
+        return cached_version
+
+    _version_cache = (mtime, version)
+    return version
@@ -0,0 +1,236 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from common.chain_singleton import ChainSingleton
+from common.config import (
+    DATA_DIR, INDEX_WATCH_INTERVAL, USE_CONFLUENCE, USE_MANTIS, USE_HISTORY,
+    CONFLUENCE_SYNC_INTERVAL, MANTIS_SYNC_INTERVAL, HISTORY_SYNC_INTERVAL
+)
+from common.vectorstore import create_vectorstore, update_vectorstore
+
+logger = logging.getLogger(__name__)
+
+
+def local_files_fingerprint() -> Tuple[Tuple[str, int, int], ...]:
+    """Returns (path, mtime, size) of every supported file in DATA_DIR, to detect added, changed or removed files."""
+    from common.documentsExtension.local_file_extension import find_local_files
+
+    fingerprint = []
+    for path in find_local_files():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+def configured_source_intervals() -> Dict[str, int]:
+    """Returns the sync interval of each enabled remote source that has scheduled syncs."""
+    intervals = {
+        "confluence": CONFLUENCE_SYNC_INTERVAL if USE_CONFLUENCE else 0,
+        "mantis": MANTIS_SYNC_INTERVAL if USE_MANTIS else 0,
+        "history": HISTORY_SYNC_INTERVAL if USE_HISTORY else 0,
+    }
+    return {name: interval for name, interval in intervals.items() if interval > 0}
+
+
+class IndexRefresher:
+    def __init__(
+        self,
+        llm=None,
+        watch_interval: int = INDEX_WATCH_INTERVAL,
+        source_intervals: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """
+        Keeps the index of a running process up to date from a single background thread,
+        so index writes never overlap and requests are not blocked by them.
+
+        A full refresh incrementally syncs the vector store with all document sources (only new
+        or changed chunks are embedded), then builds a new chain over it and swaps it in through
+        ChainSingleton; requests keep being answered by the current chain meanwhile. It is
+        triggered with `request_refresh()` or, with a positive `watch_interval`, when supported
+        files in DATA_DIR are added, changed or removed. Triggers arriving during a refresh
+        result in one more refresh afterwards.
+
+        Remote sources with an interval in `source_intervals` are additionally synced on their
+        own schedule: only that loader runs (fetching what changed since its last sync), and
+        only its sources are updated or pruned in the index.
+
+        Args:
+            llm: The LLM of the rebuilt chains; set once it has been initialized.
+            watch_interval (int): Seconds between checks of DATA_DIR for changed files (0 disables watching).
+            source_intervals (Optional[Dict[str, int]]): Seconds between syncs per remote source
+                ("confluence", "mantis", "history"). Defaults to the configured intervals.
+        """
+        self.llm = llm
+        self.watch_interval = watch_interval
+        self.running = False
+        self.refreshes = 0
+        self.last_refresh: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.sources: Dict[str, Dict[str, Any]] = {
+            name: {
+                "interval": interval, "last_sync": None, "last_duration": None, "last_error": None,
+                "documents": 0, "changed": 0, "removed": 0, "embedded": 0,
+            }
+            for name, interval in (configured_source_intervals() if source_intervals is None else source_intervals).items()
+        }
+        self._next_runs: Dict[str, float] = {}
+        self._next_watch = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._fingerprint = None
+
+    @property
+    def has_schedule(self) -> bool:
+        """Whether anything runs without an explicit trigger (DATA_DIR watching or source syncs)."""
+        return self.watch_interval > 0 or bool(self.sources)
+
+    def start(self) -> None:
+        """Starts the background thread, with DATA_DIR watching and source syncs if configured."""
+        with self._lock:
+            if self._worker is not None:
+                return
+            now = time.monotonic()
+            if self.watch_interval > 0:
+                self._fingerprint = local_files_fingerprint()
+                self._next_watch = now + self.watch_interval
+                logger.info("Watching %s for changed files every %ds.", DATA_DIR, self.watch_interval)
+            for name, source in self.sources.items():
+                self._next_runs[name] = now + source["interval"]
+                logger.info("Syncing %s every %ds.", name, source["interval"])
+            self._worker = threading.Thread(target=self._run, name="index-refresher", daemon=True)
+            self._worker.start()
+
+    def request_refresh(self) -> None:
+        """Schedules a full refresh in the background thread."""
+        self.start()
+        self._wakeup.set()
+
+    def _seconds_until_next_run(self) -> Optional[float]:
+        deadlines = list(self._next_runs.values())
+        if self.watch_interval > 0:
+            deadlines.append(self._next_watch)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _run_safely(self, job: Callable[..., None], *args) -> None:
+        try:
+            job(*args)
+        except Exception as e:
+            logger.error(f"Error refreshing the index: {e}")
+
+    def _run(self) -> None:
+        while True:
+            if self._wakeup.wait(self._seconds_until_next_run()):
+                self._wakeup.clear()
+                self._run_safely(self.refresh)
+                continue
+
+            if self.watch_interval > 0 and time.monotonic() >= self._next_watch:
+                self._next_watch = time.monotonic() + self.watch_interval
+                if local_files_fingerprint() != self._fingerprint:
+                    logger.info("Files in %s changed.", DATA_DIR)
+                    self._run_safely(self.refresh)
+
+            for name, next_run in list(self._next_runs.items()):
+                if time.monotonic() >= next_run:
+                    self._next_runs[name] = time.monotonic() + self.sources[name]["interval"]
+                    self._run_safely(self.sync_source, name)
+
+    def refresh(self) -> None:
+        """
+        Syncs the vector store with all document sources and swaps in a chain over it.
+
+        Raises:
+            ValueError: If the LLM is not initialized yet, or the index or chain cannot be built.
+        """
+        from common.document_loader import iter_documents
+
+        if self.llm is None:
+            raise ValueError("The LLM is not initialized yet.")
+
+        logger.info("Refreshing the index...")
+        started = time.perf_counter()
+        # Taken before syncing, so files changed during the sync trigger another refresh
+        fingerprint = local_files_fingerprint() if self.watch_interval > 0 else None
+        self.running = True
+        try:
+            chain_instance = ChainSingleton.get_instance()
+            vector_db = create_vectorstore(iter_documents(), embedding=chain_instance.get_embeddings())
+            if not chain_instance.swap_chain(vector_db, self.llm):
+                raise ValueError("Failed to create a valid chain.")
+            self.refreshes += 1
+            self.last_error = None
+            for source in self.sources.values():
+                source["last_sync"] = time.time()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            # Also after a failure, so a broken file is only retried once it changes again
+            self._fingerprint = fingerprint
+            self.running = False
+            self.last_refresh = time.time()
+            self.last_duration = time.perf_counter() - started
+        logger.info("Index refreshed in %.1fs.", self.last_duration)
+
+    def sync_source(self, name: str) -> None:
+        """
+        Syncs the documents of one remote source into the index. The chain keeps serving
+        throughout, and sees the changes as soon as they are written.
+
+        Args:
+            name (str): The source to sync ("confluence", "mantis" or "history").
+        """
+        from common.document_loader import SOURCE_PREFIXES, load_source
+
+        source = self.sources[name]
+        started = time.perf_counter()
+        self.running = True
+        try:
+            # The stream is read, and closed, by the ingest loader thread; an empty one prunes nothing
+            stats = update_vectorstore(
+                load_source(name), SOURCE_PREFIXES[name], embedding=ChainSingleton.get_instance().get_embeddings()
+            )
+            source.update(
+                last_sync=time.time(), last_error=None, documents=stats.documents,
+                changed=stats.changed_sources, removed=stats.removed_sources, embedded=stats.embedded,
+            )
+        except Exception as e:
+            source["last_error"] = str(e)
+            raise
+        finally:
+            self.running = False
+            source["last_duration"] = time.perf_counter() - started
+        logger.info(
+            "Synced %s in %.1fs: %d documents, %d sources changed, %d removed.",
+            name, source["last_duration"], source["documents"], source["changed"], source["removed"]
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Returns whether a refresh or sync is running, the outcome of the last full refresh, and
+        per remote source the time of the last successful sync, the lag since then (seconds)
+        and the item counts of the last sync.
+        """
+        now = time.time()
+        return {
+            "running": self.running,
+            "refreshes": self.refreshes,
+            "last_refresh": self.last_refresh,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "watch_interval": self.watch_interval,
+            "sources": {
+                name: dict(source, lag=now - source["last_sync"] if source["last_sync"] else None)
+                for name, source in self.sources.items()
+            },
+        }
@@ -1,16 +1,39 @@
 import logging
 
-from typing import Union
+from typing import Callable, Dict
 
-# Import different LLM implementations
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langchain_huggingface import ChatHuggingFace
+from langchain_core.language_models import BaseChatModel
 from common.config import LLM_MODEL, LLM_PROVIDER
 
 logger = logging.getLogger(__name__)
 
-def get_llm() -> Union[ChatOllama, ChatOpenAI, ChatHuggingFace]:
+# Each provider imports its LangChain integration only when it is selected, so
+# startup does not pay for the packages of unused providers.
+
+def _create_ollama() -> BaseChatModel:
+    from langchain_ollama import ChatOllama
+    logger.info(f"Using ChatOllama as the LLM provider with model: {LLM_MODEL}")
+    return ChatOllama(model=LLM_MODEL, temperature=0.3, max_tokens=512)
+
+def _create_openai() -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    logger.info(f"Using ChatOpenAI as the LLM provider with model: {LLM_MODEL}")
+    # Optionally pass additional parameters like temperature, model name, etc.
+    return ChatOpenAI(model=LLM_MODEL, temperature=0.7)
+
+def _create_huggingface() -> BaseChatModel:
+    from langchain_huggingface import ChatHuggingFace
+    logger.info(f"Using huggingface as the LLM provider with model: {LLM_MODEL}")
+    # Optionally pass additional parameters like temperature, model name, etc.
+    return ChatHuggingFace(model=LLM_MODEL, temperature=0.7)
+
+LLM_PROVIDERS: Dict[str, Callable[[], BaseChatModel]] = {
+    "ollama": _create_ollama,
+    "openai": _create_openai,
+    "huggingface": _create_huggingface,
+}
+
+def get_llm() -> BaseChatModel:
     """
     Factory function to return an LLM instance based on configuration.
 
@@ -21,23 +44,11 @@ def get_llm() -> Union[ChatOllama, ChatOpenAI, ChatHuggingFace]:
         ValueError: If an unsupported LLM provider is specified.
     """
     logger.debug(f"Fetching LLM provider from environment: {LLM_PROVIDER}")
-    
+
     if not LLM_MODEL:
         raise ValueError("LLM_MODEL is not set. Please configure it in the environment or settings.")
-                         
-    if LLM_PROVIDER == "ollama":
-        logger.info(f"Using ChatOllama as the LLM provider with model: {LLM_MODEL}")
-        return ChatOllama(model=LLM_MODEL, temperature=0.3, max_tokens=512)
-    
-    if LLM_PROVIDER == "openai":
-        logger.info(f"Using ChatOpenAI as the LLM provider with model: {LLM_MODEL}")
-        # Optionally pass additional parameters like temperature, model name, etc.
-        return ChatOpenAI(model=LLM_MODEL, temperature=0.7)
-    
-    if LLM_PROVIDER == "huggingface":
-        logger.info(f"Using huggingface as the LLM provider with model: {LLM_MODEL}")
-        # Optionally pass additional parameters like temperature, model name, etc.
-        return ChatHuggingFace(model=LLM_MODEL, temperature=0.7)
-    
-    else:
-        raise ValueError(f"Unsupported LLM provider: {LLM_PROVIDER}")
\ No newline at end of file
+
+    create = LLM_PROVIDERS.get(LLM_PROVIDER)
+    if create is None:
+        raise ValueError(f"Unsupported LLM provider: {LLM_PROVIDER}")
+    return create()
@@ -0,0 +1,394 @@
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from common.config import (
+    LOCAL_INDEX_DIR, LOCAL_INDEX_TYPE, LOCAL_HNSW_MIN_VECTORS, LOCAL_HNSW_M, LOCAL_HNSW_EF_SEARCH
+)
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+ALIVE_FILE = "alive.npy"
+METADATA_FILE = "chunks.sqlite3"
+HNSW_FILE = "hnsw.bin"
+INITIAL_CAPACITY = 1024
+HNSW_EF_CONSTRUCTION = 200
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Returns the vectors as float32 rows scaled to unit length, so dot products are cosine similarities."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_dir: str = LOCAL_INDEX_DIR,
+        index_type: str = LOCAL_INDEX_TYPE,
+        hnsw_min_vectors: int = LOCAL_HNSW_MIN_VECTORS,
+    ) -> None:
+        """
+        Embedded vector store that needs no running service.
+
+        Vectors are kept in a memory-mapped NumPy file (one row per chunk) and chunk IDs,
+        texts and metadata in a SQLite side table. Deleted rows are tombstoned in a
+        memory-mapped mask and reused by later inserts. Opening the store maps the files
+        without reading them, so it takes milliseconds regardless of the corpus size.
+
+        Search is exact (brute-force cosine similarity) by default; with `index_type`
+        "hnsw", or "auto" once the store holds `hnsw_min_vectors` chunks, an approximate
+        HNSW index (hnswlib) is used and updated incrementally.
+
+        Args:
+            embedding (Embeddings): The embedding model.
+            index_dir (str): Directory holding the store files.
+            index_type (str): "flat", "hnsw" or "auto".
+            hnsw_min_vectors (int): Corpus size from which "auto" switches to HNSW.
+        """
+        self.embedding = embedding
+        self.index_dir = Path(index_dir)
+        self.index_type = index_type
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None
+        self._size = 0
+        self._generation = 0
+        self._hnsw = None
+        self._hnsw_dirty = False
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.index_dir / METADATA_FILE), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        # "updated" is the generation of the last write to each row, so readers can apply only what changed
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, text TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, updated INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS chunks_deleted ON chunks (deleted)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS chunks_updated ON chunks (updated)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.commit()
+        self._open()
+        logger.info("Local vector store opened at %s with %d rows.", self.index_dir, self._size)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    # --- Storage ---
+
+    def _get_meta(self, key: str, default: str = "0") -> str:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _open(self) -> None:
+        """Maps the vector and tombstone files and reads the row count and generation."""
+        vectors_path = self.index_dir / VECTORS_FILE
+        if vectors_path.exists():
+            self._vectors = np.load(vectors_path, mmap_mode="r+")
+            self._alive = np.load(self.index_dir / ALIVE_FILE, mmap_mode="r+")
+        else:
+            self._vectors = None
+            self._alive = None
+        (max_row,) = self._connection.execute("SELECT MAX(row) FROM chunks").fetchone()
+        self._size = max_row + 1 if max_row is not None else 0
+        self._generation = int(self._get_meta("generation"))
+
+    def _reload_if_changed(self) -> None:
+        """
+        Reopens the files if another store instance or process (e.g. an ingestion run) wrote
+        to the store. An HNSW index already in memory is kept and updated with just the rows
+        written since, instead of being rebuilt for every committed batch.
+        """
+        generation = int(self._get_meta("generation"))
+        if generation == self._generation:
+            return
+        previous = self._generation
+        self._open()
+        if self._hnsw is None:
+            return
+        if self._vectors is None or int(self._get_meta("reset_generation")) > previous:
+            self._hnsw = None
+            return
+
+        changed = self._connection.execute(
+            "SELECT row, deleted FROM chunks WHERE updated > ?", (previous,)
+        ).fetchall()
+        if self._vectors.shape[0] > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(self._vectors.shape[0])
+        added = np.array([row for row, deleted in changed if not deleted], dtype=np.int64)
+        if len(added):
+            self._hnsw.add_items(self._vectors[added], added)
+        for row, deleted in changed:
+            if deleted:
+                try:
+                    self._hnsw.mark_deleted(row)
+                except RuntimeError:
+                    # Added and deleted since the last reload, so never in this graph
+                    pass
+        logger.info("Local vector store changed on disk. Applied %d changed rows to the HNSW index.", len(changed))
+
+    def _commit(self) -> None:
+        """Flushes the mapped files and commits the side table as a new generation."""
+        self._vectors.flush()
+        self._alive.flush()
+        self._generation += 1
+        self._set_meta("generation", self._generation)
+        self._connection.commit()
+
+    def _grow(self, name: str, array: Optional[np.ndarray], shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """Copies a mapped array into a larger file that atomically replaces the old one."""
+        path = self.index_dir / name
+        temp_path = path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype, shape=shape)
+        if array is not None:
+            grown[:array.shape[0]] = array
+        grown.flush()
+        del grown
+        temp_path.replace(path)
+        return np.load(path, mmap_mode="r+")
+
+    def _ensure_capacity(self, needed: int, dim: int) -> None:
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store dimension {self._vectors.shape[1]}.")
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        logger.info("Growing local vector store to %d rows.", capacity)
+        self._vectors = self._grow(VECTORS_FILE, self._vectors, (capacity, dim), np.float32)
+        self._alive = self._grow(ALIVE_FILE, self._alive, (capacity,), np.uint8)
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+
+    def _count(self) -> int:
+        return 0 if self._alive is None else int(np.count_nonzero(self._alive[:self._size]))
+
+    def reset(self) -> None:
+        """Deletes all vectors and chunks."""
+        with self._lock:
+            self._vectors = None
+            self._alive = None
+            self._hnsw = None
+            for name in (VECTORS_FILE, ALIVE_FILE, HNSW_FILE):
+                (self.index_dir / name).unlink(missing_ok=True)
+            self._connection.execute("DELETE FROM chunks")
+            self._connection.execute("DELETE FROM meta WHERE key = 'hnsw_generation'")
+            self._size = 0
+            self._generation += 1
+            self._set_meta("generation", self._generation)
+            self._set_meta("reset_generation", self._generation)
+            self._connection.commit()
+
+    # --- Approximate index ---
+
+    def _use_hnsw(self) -> bool:
+        if self.index_type == "hnsw":
+            return True
+        return self.index_type == "auto" and self._count() >= self.hnsw_min_vectors
+
+    def _get_hnsw(self):
+        """Returns the HNSW index, loading or building it on first use; None for exact search."""
+        if self._hnsw is not None or self._vectors is None or not self._use_hnsw():
+            return self._hnsw
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; using exact search.")
+            self.index_type = "flat"
+            return None
+
+        capacity, dim = self._vectors.shape
+        index = hnswlib.Index(space="ip", dim=dim)
+        hnsw_path = self.index_dir / HNSW_FILE
+        if hnsw_path.exists() and int(self._get_meta("hnsw_generation", "-1")) == self._generation:
+            index.load_index(str(hnsw_path), max_elements=capacity)
+            logger.info("HNSW index loaded from %s.", hnsw_path)
+        else:
+            logger.info("Building HNSW index over %d vectors...", self._count())
+            index.init_index(max_elements=capacity, ef_construction=HNSW_EF_CONSTRUCTION, M=LOCAL_HNSW_M)
+            rows = np.flatnonzero(self._alive[:self._size])
+            if len(rows):
+                index.add_items(self._vectors[rows], rows)
+            self._hnsw_dirty = True
+        index.set_ef(LOCAL_HNSW_EF_SEARCH)
+        self._hnsw = index
+        return index
+
+    def save_index(self) -> None:
+        """Builds the HNSW index if it is due and persists it if it changed, for the current generation."""
+        with self._lock:
+            self._get_hnsw()
+            if self._hnsw is None or not self._hnsw_dirty:
+                return
+            self._hnsw.save_index(str(self.index_dir / HNSW_FILE))
+            self._set_meta("hnsw_generation", self._generation)
+            self._connection.commit()
+            self._hnsw_dirty = False
+            logger.info("HNSW index saved.")
+
+    # --- VectorStore API ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = normalize_rows(self.embedding.embed_documents(texts))
+
+        with self._lock:
+            # Existing IDs are overwritten in place, then tombstoned rows are reused
+            rows = dict(self._lookup_rows(ids, include_deleted=True))
+            new_ids = [chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id not in rows]
+            free_rows = [row for (row,) in self._connection.execute(
+                "SELECT row FROM chunks WHERE deleted = 1 ORDER BY row LIMIT ?", (len(new_ids),)
+            )]
+            for chunk_id in new_ids:
+                if free_rows:
+                    rows[chunk_id] = free_rows.pop(0)
+                else:
+                    rows[chunk_id] = self._size
+                    self._size += 1
+
+            self._ensure_capacity(self._size, vectors.shape[1])
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, text, metadata, deleted, updated) VALUES (?, ?, ?, ?, 0, ?)",
+                [(rows[chunk_id], chunk_id, text, json.dumps(metadata, ensure_ascii=False), self._generation + 1)
+                 for chunk_id, text, metadata in zip(ids, texts, metadatas)],
+            )
+            row_array = np.array([rows[chunk_id] for chunk_id in ids], dtype=np.int64)
+            self._vectors[row_array] = vectors
+            self._alive[row_array] = 1
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, row_array)
+                self._hnsw_dirty = True
+            self._commit()
+        return ids
+
+    def _lookup_rows(self, ids: List[str], include_deleted: bool = False) -> List[Tuple[str, int]]:
+        found = []
+        unique_ids = list(dict.fromkeys(ids))
+        condition = "" if include_deleted else " AND deleted = 0"
+        for start in range(0, len(unique_ids), LOOKUP_BATCH_SIZE):
+            batch = unique_ids[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            found.extend(self._connection.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({placeholders}){condition}", batch
+            ).fetchall())
+        return found
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            rows = [row for _, row in self._lookup_rows(list(ids))]
+            if not rows:
+                return False
+            self._connection.executemany(
+                "UPDATE chunks SET deleted = 1, updated = ? WHERE row = ?", [(self._generation + 1, row) for row in rows]
+            )
+            self._alive[rows] = 0
+            if self._hnsw is not None:
+                for row in rows:
+                    self._hnsw.mark_deleted(row)
+                self._hnsw_dirty = True
+            self._commit()
+        return True
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        with self._lock:
+            rows = [row for _, row in self._lookup_rows(list(ids))]
+            return self._documents(rows)
+
+    def _documents(self, rows: List[int]) -> List[Document]:
+        """Fetches the chunks stored in the given rows, in the same order."""
+        by_row = {}
+        for start in range(0, len(rows), LOOKUP_BATCH_SIZE):
+            batch = [int(row) for row in rows[start:start + LOOKUP_BATCH_SIZE]]
+            placeholders = ",".join("?" * len(batch))
+            for row, chunk_id, text, metadata in self._connection.execute(
+                f"SELECT row, id, text, metadata FROM chunks WHERE row IN ({placeholders})", batch
+            ):
+                by_row[row] = Document(id=chunk_id, page_content=text, metadata=json.loads(metadata))
+        return [by_row[int(row)] for row in rows if int(row) in by_row]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """Returns the `k` chunks most similar to the vector with their cosine similarity."""
+        query = normalize_rows(embedding)[0]
+        with self._lock:
+            self._reload_if_changed()
+            count = self._count()
+            if not count:
+                return []
+            k = min(k, count)
+
+            index = self._get_hnsw()
+            if index is not None:
+                labels, distances = index.knn_query(query, k=k)
+                rows, scores = labels[0], 1.0 - distances[0]
+            else:
+                scores = self._vectors[:self._size] @ query
+                scores[self._alive[:self._size] == 0] = -np.inf
+                rows = np.argpartition(-scores, k - 1)[:k]
+                rows = rows[np.argsort(-scores[rows])]
+                scores = scores[rows]
+
+            documents = self._documents(list(rows))
+        return list(zip(documents, (float(score) for score in scores)))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
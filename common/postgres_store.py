@@ -0,0 +1,148 @@
+import logging
+import math
+import re
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from common.config import (
+    POSTGRES_CONNECTION_STRING, POSTGRES_POOL_SIZE, POSTGRES_MAX_OVERFLOW, POSTGRES_POOL_RECYCLE,
+    POSTGRES_VECTOR_INDEX, POSTGRES_HNSW_M, POSTGRES_HNSW_EF_CONSTRUCTION, POSTGRES_HNSW_EF_SEARCH,
+    POSTGRES_IVFFLAT_LISTS, POSTGRES_IVFFLAT_PROBES
+)
+
+logger = logging.getLogger(__name__)
+
+# Table in which langchain_postgres stores the vectors of all collections
+EMBEDDING_TABLE = "langchain_pg_embedding"
+VECTOR_INDEX_TYPES = ("hnsw", "ivfflat")
+# An IVFFlat index is rebuilt once the list count suited to the table grows by this factor
+IVFFLAT_REBUILD_FACTOR = 2
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _set_search_parameters(dbapi_connection, connection_record) -> None:
+    """Sets the ANN search parameters on every new pooled connection."""
+    if POSTGRES_VECTOR_INDEX == "hnsw":
+        statement = f"SET hnsw.ef_search = {int(POSTGRES_HNSW_EF_SEARCH)}"
+    elif POSTGRES_VECTOR_INDEX == "ivfflat":
+        statement = f"SET ivfflat.probes = {int(POSTGRES_IVFFLAT_PROBES)}"
+    else:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(statement)
+    finally:
+        cursor.close()
+    # Commit so the setting is not undone when the pool rolls the connection back
+    dbapi_connection.commit()
+
+
+def get_postgres_engine() -> Engine:
+    """
+    Returns the process-wide SQLAlchemy engine, so the vector store opened on startup and by
+    later index refreshes share one connection pool (sized by POSTGRES_POOL_SIZE and
+    POSTGRES_MAX_OVERFLOW). Connections are checked before use and recycled periodically.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(
+                POSTGRES_CONNECTION_STRING,
+                pool_size=POSTGRES_POOL_SIZE,
+                max_overflow=POSTGRES_MAX_OVERFLOW,
+                pool_recycle=POSTGRES_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+            event.listen(_engine, "connect", _set_search_parameters)
+        return _engine
+
+
+def ivfflat_lists(rows: int) -> int:
+    """Returns the IVFFlat list count for a table size, as recommended by pgvector."""
+    if POSTGRES_IVFFLAT_LISTS > 0:
+        return POSTGRES_IVFFLAT_LISTS
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def ensure_vector_index(engine: Engine, dimensions: int, index_type: str = POSTGRES_VECTOR_INDEX) -> None:
+    """
+    Creates the ANN index on the embedding column if it is missing, without blocking writes.
+
+    An index left invalid by a failed concurrent build is dropped and built again. HNSW
+    indexes are maintained by PostgreSQL as rows are upserted. IVFFlat clusters are fixed
+    at build time, so an IVFFlat index is rebuilt (side by side, then swapped) once the table has
+    grown enough to warrant IVFFLAT_REBUILD_FACTOR times as many lists.
+
+    Args:
+        engine (Engine): The engine of the vector store.
+        dimensions (int): The vector size; an untyped embedding column is fixed to it, as
+            pgvector can only index columns with dimensions.
+        index_type (str): "hnsw", "ivfflat", or anything else to skip indexing.
+    """
+    if index_type not in VECTOR_INDEX_TYPES:
+        return
+    index_name = f"{EMBEDDING_TABLE}_{index_type}_idx"
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        row = connection.execute(
+            text("SELECT pg_get_indexdef(indexrelid), indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": index_name}
+        ).fetchone()
+        definition = row[0] if row else None
+        if row is not None and not row[1]:
+            # A failed CREATE INDEX CONCURRENTLY leaves an invalid index that queries cannot use
+            logger.warning("Index %s is invalid. Dropping it to rebuild it...", index_name)
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+            definition = None
+
+        if index_type == "hnsw":
+            if definition is not None:
+                return
+            options = f"m = {int(POSTGRES_HNSW_M)}, ef_construction = {int(POSTGRES_HNSW_EF_CONSTRUCTION)}"
+        else:
+            rows = connection.execute(text(f"SELECT count(*) FROM {EMBEDDING_TABLE}")).scalar() or 0
+            if rows == 0:
+                logger.info("Skipping the IVFFlat index until the table has rows to cluster.")
+                return
+            lists = ivfflat_lists(rows)
+            if definition is not None:
+                match = re.search(r"lists\s*=\s*'?(\d+)", definition)
+                current = int(match.group(1)) if match else 0
+                if lists < current * IVFFLAT_REBUILD_FACTOR:
+                    return
+                logger.info("IVFFlat index has %d lists for %d rows. Rebuilding it with %d lists...", current, rows, lists)
+            options = f"lists = {lists}"
+
+        column_type = connection.execute(
+            text(
+                "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+            ),
+            {"table": EMBEDDING_TABLE}
+        ).scalar()
+        if column_type == "vector":
+            logger.info("Setting the embedding column to %d dimensions so it can be indexed...", dimensions)
+            connection.execute(text(f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({int(dimensions)})"))
+
+        # Build under a temporary name and swap, so an existing index serves queries meanwhile
+        build_name = f"{index_name}_new" if definition is not None else index_name
+        logger.info("Creating %s index %s (%s)...", index_type.upper(), index_name, options)
+        started = time.perf_counter()
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}_new"))
+        connection.execute(text(
+            f"CREATE INDEX CONCURRENTLY {build_name} ON {EMBEDDING_TABLE} "
+            f"USING {index_type} (embedding vector_cosine_ops) WITH ({options})"
+        ))
+        if definition is not None:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY {index_name}"))
+            connection.execute(text(f"ALTER INDEX {build_name} RENAME TO {index_name}"))
+        logger.info("Index %s created in %.1fs.", index_name, time.perf_counter() - started)
@@ -1,13 +1,22 @@
 import logging
-from langchain.memory import ConversationBufferMemory
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from langchain.prompts import ChatPromptTemplate
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 
 logger = logging.getLogger(__name__)
 
-from common.config import USE_MULTIQUERY
+from common.bm25_index import get_bm25_index
+from common.config import (
+    USE_MULTIQUERY, USE_RETRIEVAL_CACHE, USE_HYBRID_SEARCH, USE_CONTEXT_PACKING, USE_RERANKER,
+    MULTIQUERY_MODE, MULTIQUERY_TOP_N, RETRIEVER_K, HYBRID_TOP_N, RERANK_FETCH_K
+)
+from common.context_packer import ContextPacker
+from common.reranker import GenerationTimingHandler, RerankingRetriever, get_reranker
+from common.retrievers import FusionMultiQueryRetriever, HybridRetriever
+from common.retrieval_cache import CachedRetriever, RetrievalCache
 
 # Multi-query retriever prompt
 MULTI_QUERY_PROMPT = ChatPromptTemplate.from_messages([
@@ -32,37 +41,76 @@ User Question: {question}
 
 Provide a detailed and accurate response based on the documents above."""
 
-def create_memory():
-    return ConversationBufferMemory(input_key="question", memory_key="history")
-
 def create_retriever(vector_db, llm):
-    """Creates a retriever, optionally using MultiQueryRetriever."""
+    """
+    Creates a retriever, optionally using MultiQueryRetriever, hybrid BM25 search, cross-encoder
+    reranking and the retrieval cache. With reranking, the earlier stages over-fetch
+    RERANK_FETCH_K candidates for the reranker to choose from.
+    """
 
     if not vector_db:
         raise ValueError("Vector database cannot be None.")
-    
-    if USE_MULTIQUERY:
+
+    fetch_k = RERANK_FETCH_K if USE_RERANKER else None
+
+    if USE_MULTIQUERY and MULTIQUERY_MODE == "fusion":
+        logger.info("Using FusionMultiQueryRetriever...")
+        retriever = FusionMultiQueryRetriever.from_llm(
+            vector_db, llm, prompt=MULTI_QUERY_PROMPT, top_n=fetch_k or MULTIQUERY_TOP_N
+        )
+    elif USE_MULTIQUERY:
         logger.info("Using MultiQueryRetriever...")
-        return MultiQueryRetriever.from_llm(vector_db.as_retriever(), llm, prompt=MULTI_QUERY_PROMPT)
+        retriever = MultiQueryRetriever.from_llm(vector_db.as_retriever(), llm, prompt=MULTI_QUERY_PROMPT)
     else:
         logger.info("Using basic retriever...")
-        return vector_db.as_retriever()
+        retriever = vector_db.as_retriever(search_kwargs={"k": fetch_k or RETRIEVER_K})
+
+    if USE_HYBRID_SEARCH:
+        logger.info("Using hybrid BM25 + vector search...")
+        retriever = HybridRetriever(
+            retriever=retriever,
+            lexical_index=get_bm25_index(),
+            top_n=fetch_k or HYBRID_TOP_N,
+            executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25")
+        )
+
+    if USE_RERANKER:
+        logger.info("Using cross-encoder reranking...")
+        retriever = RerankingRetriever(retriever=retriever, reranker=get_reranker())
+
+    if USE_RETRIEVAL_CACHE:
+        logger.info("Using retrieval cache...")
+        retriever = CachedRetriever(retriever=retriever, cache=RetrievalCache())
+    return retriever
 
 def create_chain(vector_db, llm):
-    """Creates the end-to-end RAG chain with memory."""
+    """
+    Creates the end-to-end RAG chain. It takes `{"question": ..., "history": ...}` as input,
+    where the optional history is the session's conversation prepared by ConversationHistory.
+    """
 
     if not llm:
         raise ValueError("LLM cannot be None.")
     
     retriever = create_retriever(vector_db, llm)
+    context = itemgetter("question") | retriever
+    if USE_CONTEXT_PACKING:
+        logger.info("Using context packing...")
+        # Reranked chunks are already in the best order, so MMR reordering is skipped
+        packer = ContextPacker(None if USE_RERANKER else vector_db.embeddings)
+        context = {"question": itemgetter("question"), "documents": context} | RunnableLambda(packer.pack_input)
 
     logger.info("Creating RAG chain...")
 
     prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
     
     return (
-        {"context": retriever, "history": create_memory().load_memory_variables, "question": RunnablePassthrough()}
+        {
+            "context": context,
+            "history": lambda input: input.get("history") or "None",
+            "question": itemgetter("question"),
+        }
         | prompt
-        | llm
+        | llm.with_config(callbacks=[GenerationTimingHandler()])
         | StrOutputParser()
     )
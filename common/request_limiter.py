@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from common.config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot even be queued because the wait queue is full."""
+
+
+class RequestLimiter:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE) -> None:
+        """
+        Caps how many LLM calls run at once, with a bounded queue of waiting requests.
+
+        Args:
+            max_concurrency (int): Maximum number of requests holding a slot at the same time.
+            max_queue (int): Maximum number of requests waiting for a slot. Further requests
+                are rejected immediately with QueueFullError.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self.rejected = 0
+
+    def is_full(self) -> bool:
+        """Returns True if a new request would be rejected right now."""
+        return self._active + self._waiting >= self.max_concurrency + self.max_queue
+
+    @asynccontextmanager
+    async def slot(self, timeout: float) -> AsyncIterator[None]:
+        """
+        Waits for a free slot and holds it for the duration of the block.
+
+        Args:
+            timeout (float): Seconds to wait for a slot before raising asyncio.TimeoutError.
+
+        Raises:
+            QueueFullError: If all slots are busy and the wait queue is full.
+            asyncio.TimeoutError: If no slot became free within the timeout.
+        """
+        if self.is_full():
+            self.rejected += 1
+            logger.warning("Request rejected: %d active, %d waiting.", self._active, self._waiting)
+            raise QueueFullError("Too many requests waiting for the LLM backend.")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of active, waiting, and rejected requests."""
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
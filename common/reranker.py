@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun, BaseCallbackHandler, CallbackManagerForRetrieverRun
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from common.config import RERANKER_MODEL, RERANK_BATCH_SIZE, RERANK_CACHE_MAX_ENTRIES, RERANK_TOP_N
+from common.retrieval_cache import normalize_query
+from common.vectorstore import generate_stable_id
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache_size: int = RERANK_CACHE_MAX_ENTRIES,
+    ) -> None:
+        """
+        Scores (question, chunk) pairs with a sentence-transformers cross-encoder on CPU.
+
+        Pairs are scored in batches, and scores are cached per (normalized question, chunk ID)
+        in an LRU map, so repeated or overlapping candidate sets are only scored once.
+
+        Args:
+            model_name (str): Hugging Face name of the cross-encoder model.
+            batch_size (int): Pairs scored per forward pass.
+            cache_size (int): Maximum number of cached scores.
+        """
+        from sentence_transformers import CrossEncoder
+
+        logger.info("Loading cross-encoder reranker: %s", model_name)
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score(self, question: str, documents: List[Document]) -> List[float]:
+        """Returns the relevance score of each document for the question."""
+        query = normalize_query(question)
+        keys = [(query, generate_stable_id(doc)) for doc in documents]
+
+        with self._lock:
+            cached: Dict[Tuple[str, str], float] = {key: self._scores[key] for key in keys if key in self._scores}
+            for key in cached:
+                self._scores.move_to_end(key)
+
+        missing = [index for index, key in enumerate(keys) if key not in cached]
+        if missing:
+            scores = self.model.predict(
+                [(question, documents[index].page_content) for index in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            with self._lock:
+                for index, score in zip(missing, scores):
+                    cached[keys[index]] = self._scores[keys[index]] = float(score)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        return [cached[key] for key in keys]
+
+    def rerank(self, question: str, documents: List[Document], top_n: int) -> List[Document]:
+        """Returns the `top_n` documents with the highest cross-encoder score, best first."""
+        if not documents:
+            return []
+        scores = self.score(question, documents)
+        ranked = sorted(zip(scores, range(len(documents))), key=lambda pair: pair[0], reverse=True)
+        return [documents[index] for _, index in ranked[:top_n]]
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Returns the process-wide reranker, loading the model on first use so rebuilt chains share it."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Retriever that over-fetches candidates from the wrapped retriever and keeps the
+    `top_n` best according to the cross-encoder, logging the time of both stages.
+    """
+
+    retriever: BaseRetriever
+    reranker: Any
+    top_n: int = RERANK_TOP_N
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _log_timing(self, candidates: int, retrieve_time: float, rerank_time: float) -> None:
+        logger.info(
+            "Retrieved %d candidates in %.0f ms, reranked to %d in %.0f ms.",
+            candidates, retrieve_time * 1000, min(candidates, self.top_n), rerank_time * 1000
+        )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        started = time.perf_counter()
+        candidates = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        retrieved = time.perf_counter()
+        documents = self.reranker.rerank(query, candidates, self.top_n)
+        self._log_timing(len(candidates), retrieved - started, time.perf_counter() - retrieved)
+        return documents
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        started = time.perf_counter()
+        candidates = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        retrieved = time.perf_counter()
+        documents = await asyncio.to_thread(self.reranker.rerank, query, candidates, self.top_n)
+        self._log_timing(len(candidates), retrieved - started, time.perf_counter() - retrieved)
+        return documents
+
+
+class GenerationTimingHandler(BaseCallbackHandler):
+    """Logs time to first token and total generation time of each LLM call."""
+
+    def __init__(self) -> None:
+        self._started: Dict[Any, float] = {}
+        self._first_token: Dict[Any, float] = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        self._first_token.setdefault(run_id, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        first_token = self._first_token.pop(run_id, None)
+        if started is None:
+            return
+        if first_token is not None:
+            logger.info(
+                "Generation took %.0f ms (first token after %.0f ms).",
+                (time.perf_counter() - started) * 1000, (first_token - started) * 1000
+            )
+        else:
+            logger.info("Generation took %.0f ms.", (time.perf_counter() - started) * 1000)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._started.pop(run_id, None)
+        self._first_token.pop(run_id, None)
@@ -0,0 +1,112 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from common.config import RETRIEVAL_CACHE_MAX_ENTRIES
+from common.index_manifest import get_index_version
+
+logger = logging.getLogger(__name__)
+
+# Log the hit rate every this many lookups
+STATS_LOG_INTERVAL = 100
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a query so trivially different spellings share a cache entry."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+class RetrievalCache:
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES, version_fn: Callable[[], int] = get_index_version) -> None:
+        """
+        In-process LRU cache of retriever results keyed by (normalized query, index version).
+
+        Args:
+            max_entries (int): Maximum number of cached queries.
+            version_fn: Returns the current index version; entries of older versions are never hit.
+        """
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], List[Document]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _key(self, query: str) -> Tuple[str, int]:
+        version = self.version_fn()
+        if version != self._version:
+            # The index changed, so every cached result is stale
+            self._entries.clear()
+            self._version = version
+        return normalize_query(query), version
+
+    def get(self, query: str):
+        """Returns the cached documents for the query, or None on a miss."""
+        with self._lock:
+            key = self._key(query)
+            documents = self._entries.get(key)
+            if documents is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            if (self.hits + self.misses) % STATS_LOG_INTERVAL == 0:
+                self.log_stats()
+        return list(documents) if documents is not None else None
+
+    def put(self, query: str, documents: List[Document]) -> None:
+        """Caches the documents retrieved for the query."""
+        with self._lock:
+            self._entries[self._key(query)] = list(documents)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the hit rate."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def log_stats(self) -> None:
+        """Logs the current hit/miss counters."""
+        stats = self.get_stats()
+        logger.info(
+            "Retrieval cache: %d entries, %d hits, %d misses (hit rate %.1f%%).",
+            stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"] * 100
+        )
+
+
+class CachedRetriever(BaseRetriever):
+    """Retriever that serves repeated queries from a RetrievalCache before calling the wrapped retriever."""
+
+    retriever: BaseRetriever
+    cache: RetrievalCache
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.cache.get(query)
+        if documents is None:
+            documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(query, documents)
+        return documents
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.cache.get(query)
+        if documents is None:
+            documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(query, documents)
+        return documents
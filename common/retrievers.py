@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from common.config import (
+    BM25_K, HYBRID_TOP_N, MULTIQUERY_MAX_WORKERS, MULTIQUERY_SKIP_THRESHOLD, MULTIQUERY_TOP_N, RETRIEVER_K
+)
+from common.vectorstore import generate_stable_id
+
+logger = logging.getLogger(__name__)
+
+# Constant of reciprocal rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+MAX_QUERY_VARIANTS = 5
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Document]],
+    top_n: int,
+    id_fn: Callable[[Document], str] = generate_stable_id,
+    rrf_k: int = RRF_K,
+) -> List[Document]:
+    """
+    Merges ranked result lists with reciprocal rank fusion, deduplicating by chunk ID.
+
+    Args:
+        result_lists: Ranked document lists, best first.
+        top_n (int): Number of fused documents to return.
+        id_fn: Returns the ID used to recognise the same chunk across lists.
+        rrf_k (int): Damping constant; higher values flatten the rank weighting.
+
+    Returns:
+        List[Document]: The `top_n` documents with the highest fused score.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            doc_id = id_fn(doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(doc_id, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[doc_id] for doc_id in ranked[:top_n]]
+
+
+def parse_query_variants(text: str) -> List[str]:
+    """Splits the LLM output into one query per line, dropping list numbering and bullets."""
+    variants = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", line).strip()
+        if line:
+            variants.append(line)
+    return variants[:MAX_QUERY_VARIANTS]
+
+
+def embed_queries(embeddings, queries: List[str]) -> List[List[float]]:
+    """Embeds several queries in one batch call."""
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)
+    return embeddings.embed_documents(queries)
+
+
+class FusionMultiQueryRetriever(BaseRetriever):
+    """
+    Multi-query retriever that embeds all query variants in a single batch, searches
+    them concurrently and merges the results with reciprocal rank fusion.
+
+    The original question is searched first; if its best hit is already above
+    `skip_threshold`, query expansion (and its LLM round trip) is skipped.
+    """
+
+    vectorstore: Any
+    query_generator: Any
+    k: int = RETRIEVER_K
+    top_n: int = MULTIQUERY_TOP_N
+    skip_threshold: float = MULTIQUERY_SKIP_THRESHOLD
+    executor: Any = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @classmethod
+    def from_llm(cls, vectorstore, llm, prompt, **kwargs) -> "FusionMultiQueryRetriever":
+        """Creates the retriever with a query generator built from the LLM and prompt."""
+        return cls(
+            vectorstore=vectorstore,
+            query_generator=prompt | llm | StrOutputParser(),
+            executor=ThreadPoolExecutor(max_workers=MULTIQUERY_MAX_WORKERS, thread_name_prefix="multiquery"),
+            **kwargs
+        )
+
+    def _search_original(self, query: str) -> Tuple[List[Document], bool]:
+        """
+        Searches the original question. Returns its results and, when the store supports
+        relevance scores, whether the best hit is confident enough to skip expansion.
+        """
+        try:
+            scored = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.k)
+        except NotImplementedError:
+            return self.vectorstore.similarity_search(query, k=self.k), False
+
+        documents = [doc for doc, _ in scored]
+        confident = bool(scored) and self.skip_threshold > 0 and scored[0][1] >= self.skip_threshold
+        return documents, confident
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # The vector search is cheap compared to the LLM call, so check it first
+        original_results, confident = self._search_original(query)
+        if confident:
+            logger.info("High-confidence hits for the original question; skipping query expansion.")
+            return original_results[:self.top_n]
+
+        try:
+            variants = parse_query_variants(
+                self.query_generator.invoke({"question": query}, {"callbacks": run_manager.get_child()})
+            )
+        except Exception as e:
+            logger.error(f"Error generating query variants, using the original question only: {e}")
+            return original_results[:self.top_n]
+
+        variants = [variant for variant in variants if variant != query]
+        logger.info("Generated %d query variants.", len(variants))
+        if not variants:
+            return original_results[:self.top_n]
+
+        vectors = embed_queries(self.vectorstore.embeddings, variants)
+        variant_results = list(self.executor.map(
+            lambda vector: self.vectorstore.similarity_search_by_vector(vector, k=self.k), vectors
+        ))
+        return reciprocal_rank_fusion([original_results, *variant_results], top_n=self.top_n)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs a BM25 keyword search alongside the wrapped vector retriever and merges both
+    rankings with reciprocal rank fusion, so exact identifiers and rare terms (error
+    codes, ticket numbers, config keys) are found even when embeddings miss them.
+    """
+
+    retriever: BaseRetriever
+    lexical_index: Any
+    k: int = BM25_K
+    top_n: int = HYBRID_TOP_N
+    executor: Any = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _search_lexical(self, query: str) -> List[Document]:
+        try:
+            return self.lexical_index.search(query, k=self.k)
+        except Exception as e:
+            logger.error(f"Error searching the BM25 index: {e}")
+            return []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if self.executor is None:
+            lexical_results = self._search_lexical(query)
+            vector_results = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        else:
+            lexical_future = self.executor.submit(self._search_lexical, query)
+            vector_results = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            lexical_results = lexical_future.result()
+        return reciprocal_rank_fusion([vector_results, lexical_results], top_n=self.top_n)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        vector_results, lexical_results = await asyncio.gather(
+            self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}),
+            asyncio.to_thread(self._search_lexical, query),
+        )
+        return reciprocal_rank_fusion([vector_results, lexical_results], top_n=self.top_n)
@@ -0,0 +1,97 @@
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Number of packages listed in the import section of the report
+REPORT_TOP_IMPORTS = 20
+
+
+class StartupProfiler:
+    def __init__(self) -> None:
+        """
+        Records how long startup spends importing each package and in each initialization phase.
+
+        Imports are timed by wrapping `builtins.__import__`: the first import of a package
+        from outside it is charged the cumulative time of loading it, including the packages
+        it pulls in, which matches the "cumulative" column of `python -X importtime`.
+        """
+        self.started = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self.phases: List[Tuple[str, float]] = []
+        self._local = threading.local()
+        self._original_import = None
+
+    def install(self) -> None:
+        """Starts timing imports."""
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def uninstall(self) -> None:
+        """Stops timing imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import or builtins.__import__
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        package = name.partition(".")[0]
+        stack = self._local.__dict__.setdefault("stack", [])
+        outermost = package not in stack
+        stack.append(package)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            stack.pop()
+            if outermost:
+                self.imports[package] = self.imports.get(package, 0.0) + time.perf_counter() - started
+
+    def record_phase(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    def format_report(self) -> str:
+        """Returns the import and phase timings as a text table."""
+        lines = [f"Startup profile ({time.perf_counter() - self.started:.2f}s since profiling started)", "", "Imports (cumulative):"]
+        for package, seconds in sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:REPORT_TOP_IMPORTS]:
+            lines.append(f"  {seconds * 1000:10.1f} ms  {package}")
+        lines.extend(["", "Phases:"])
+        for name, seconds in self.phases:
+            lines.append(f"  {seconds * 1000:10.1f} ms  {name}")
+        return "\n".join(lines)
+
+
+_profiler: Optional[StartupProfiler] = None
+
+
+def start_profiling() -> StartupProfiler:
+    """Creates the process-wide profiler and starts timing imports."""
+    global _profiler
+    if _profiler is None:
+        _profiler = StartupProfiler()
+        _profiler.install()
+    return _profiler
+
+
+def get_profiler() -> Optional[StartupProfiler]:
+    """Returns the active profiler, or None when startup is not being profiled."""
+    return _profiler
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """Times the enclosed block as a startup phase when profiling is active."""
+    if _profiler is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _profiler.record_phase(name, time.perf_counter() - started)
@@ -1,27 +1,37 @@
 import logging
 import hashlib
-from elasticsearch import Elasticsearch
-
-from langchain_community.vectorstores import Chroma, ElasticsearchStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_postgres import PGVector
-from sqlalchemy import create_engine
+import threading
+import time
+from itertools import groupby
+from pathlib import Path
+from queue import Full, Queue
 
 from common.config import (
-    DB_TYPE, CHROMA_COLLECTION_NAME, POSTGRES_CONNECTION_STRING, 
+    DB_TYPE, CHROMA_COLLECTION_NAME, POSTGRES_VECTOR_INDEX,
     EMBEDDING_MODEL, EMBEDDING_MODEL_NAME, ELASTICSEARCH_URL, ELASTICSEARCH_INDEX,
-    ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD, POSTGRES_HOST
+    ELASTICSEARCH_BLUE_GREEN, POSTGRES_HOST, POSTGRES_DB,
+    CHROMA_PERSIST_DIR, USE_EMBEDDING_CACHE, INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE, USE_HYBRID_SEARCH,
+    LOCAL_INDEX_DIR
 )
+from common.bm25_index import get_bm25_index
+from common.embedding_cache import CachedEmbeddings
+from common.embedding_engine import embedding_namespace, produces_unit_vectors
+from common.index_manifest import IndexManifest, hash_documents
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+UNKNOWN_SOURCE = "unknown"
+_END_OF_STREAM = object()
+# Seconds between checks, while the ingest queue is full, whether the consumer has stopped
+_QUEUE_POLL_INTERVAL = 0.5
+
 def generate_stable_id(doc):
     """Generate a stable ID using SHA-256 hashing for document consistency."""
     return hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()
 
-def chunk_documents(documents, chunk_size=512, chunk_overlap=50):
+def chunk_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
     Splits documents into smaller chunks of text.
 
@@ -33,153 +43,554 @@ def chunk_documents(documents, chunk_size=512, chunk_overlap=50):
     Returns:
         List of chunked documents.
     """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     logger.info("Starting document chunking process...")
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     chunked_documents = text_splitter.split_documents(documents)
     logger.info("Document chunking completed. Total chunks created: %d", len(chunked_documents))
     return chunked_documents
 
+# Embedding and vector store backends import their dependencies only when selected,
+# so startup does not pay for the packages of unused providers.
+
+def _create_huggingface_embeddings():
+    from common.embedding_engine import SentenceTransformerEmbeddings
+    logger.info("Using Hugging Face embedding model: %s", EMBEDDING_MODEL_NAME)
+    return SentenceTransformerEmbeddings()
+
+def _create_openai_embeddings():
+    from langchain_openai import OpenAIEmbeddings
+    logger.info("Using OpenAI embedding model: %s", EMBEDDING_MODEL_NAME)
+    return OpenAIEmbeddings()
+
+EMBEDDING_PROVIDERS = {
+    "huggingface": _create_huggingface_embeddings,
+    "openai": _create_openai_embeddings,
+}
+
 def get_embedding_model():
     """
-    Returns the appropriate embedding model based on the configuration.
+    Returns the appropriate embedding model based on the configuration, wrapped in the
+    persistent embedding cache unless USE_EMBEDDING_CACHE is disabled.
 
     Returns:
-        The embedding model (either HuggingFaceEmbeddings or OpenAIEmbeddings).
+        The embedding model (SentenceTransformerEmbeddings or OpenAIEmbeddings, optionally cached).
     
     Raises:
         ValueError: If an unsupported embedding model is specified.
     """
     logger.info("Selecting embedding model...")
-    if EMBEDDING_MODEL == "huggingface":
-        logger.info("Using Hugging Face embedding model: %s", EMBEDDING_MODEL_NAME)
-        return HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL_NAME, 
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': False}
-        )
-    elif EMBEDDING_MODEL == "openai":
-        logger.info("Using OpenAI embedding model: %s", EMBEDDING_MODEL_NAME)
-        return OpenAIEmbeddings()
-    else:
+    create = EMBEDDING_PROVIDERS.get(EMBEDDING_MODEL)
+    if create is None:
         logger.error("Unsupported embedding model: %s", EMBEDDING_MODEL)
         raise ValueError("Unsupported embedding model!")
+    embedding = create()
+
+    if not USE_EMBEDDING_CACHE:
+        return embedding
+    return CachedEmbeddings(embedding, model_name=embedding_namespace())
 
-def reset_elasticsearch_index():
+def embedding_dimensions(embedding):
+    """Returns the vector size of the embedding model."""
+    return len(embedding.embed_query("dimension probe"))
+
+def reset_elasticsearch_index(dimensions):
     """
-    Drops the existing Elasticsearch index (if it exists) and creates a new one.
+    Drops the existing Elasticsearch index (or the indices behind the alias of that name)
+    and creates a new one with a `dense_vector` mapping of the given size.
     Ensures a clean index every time to avoid duplicate or stale data.
     """
-    es_client = Elasticsearch(
-        ELASTICSEARCH_URL,
-        http_auth=(ELASTICSEARCH_USERNAME, ELASTICSEARCH_PASSWORD)
-    )
+    from common.elasticsearch_store import get_alias_targets, get_elasticsearch_client, index_body
+
+    es_client = get_elasticsearch_client()
 
-    # Check if the index exists
-    if es_client.indices.exists(index=ELASTICSEARCH_INDEX):
-        logger.info(f"Index {ELASTICSEARCH_INDEX} already exists. Dropping it...")
+    # Check if the index exists, directly or as an alias left by a blue/green rebuild
+    existing = get_alias_targets(es_client) or ([ELASTICSEARCH_INDEX] if es_client.indices.exists(index=ELASTICSEARCH_INDEX) else [])
+    for index in existing:
+        logger.info(f"Index {index} already exists. Dropping it...")
         try:
             # Delete the existing index
-            es_client.indices.delete(index=ELASTICSEARCH_INDEX)
-            logger.info(f"Index {ELASTICSEARCH_INDEX} deleted successfully.")
+            es_client.indices.delete(index=index)
+            logger.info(f"Index {index} deleted successfully.")
         except Exception as e:
             logger.error(f"Error deleting Elasticsearch index: {e}")
             raise ValueError(f"Error deleting Elasticsearch index: {e}")
 
     logger.info(f"Creating a fresh index: {ELASTICSEARCH_INDEX}...")
     try:
-        settings = {
-            "settings": {
-                "number_of_shards": 1,
-                "number_of_replicas": 1
-            },
-            "mappings": {
-                "properties": {
-                    "page_content": {"type": "text"},
-                    "metadata": {"type": "object"}
-                }
-            }
-        }
         # Create the new index
-        es_client.indices.create(index=ELASTICSEARCH_INDEX, body=settings)
+        es_client.indices.create(index=ELASTICSEARCH_INDEX, **index_body(dimensions))
         logger.info(f"Index {ELASTICSEARCH_INDEX} created successfully!")
     except Exception as e:
         logger.error(f"Error creating Elasticsearch index: {e}")
         raise ValueError("Error creating Elasticsearch index!")
 
-def create_vectorstore(documents):
+def get_index_signature():
     """
-    Creates a vector store (Chroma, PostgreSQL, or Elasticsearch) from the documents,
-    ensuring upsert behavior for PGVector.
+    Returns a string identifying the vector store target and embedding setup.
+    The index manifest is only reused while this signature stays the same.
+    """
+    targets = {
+        "chroma": f"{CHROMA_PERSIST_DIR}/{CHROMA_COLLECTION_NAME}",
+        "postgres": f"{POSTGRES_HOST}/{POSTGRES_DB}",
+        "elasticsearch": f"{ELASTICSEARCH_URL}/{ELASTICSEARCH_INDEX}",
+        "local": LOCAL_INDEX_DIR,
+    }
+    return "|".join([
+        DB_TYPE, str(targets.get(DB_TYPE, "")), embedding_namespace(),
+        str(CHUNK_SIZE), str(CHUNK_OVERLAP)
+    ])
+
+def _open_chroma(embedding, reset):
+    from langchain_community.vectorstores import Chroma
+
+    logger.info("Using Chroma as the vector store, persisted at %s.", CHROMA_PERSIST_DIR)
+    # Unit vectors rank the same by inner product as by cosine, at a lower cost per comparison
+    collection_metadata = {"hnsw:space": "ip"} if produces_unit_vectors() else None
+    vectorstore = Chroma(
+        collection_name=CHROMA_COLLECTION_NAME,
+        embedding_function=embedding,
+        persist_directory=CHROMA_PERSIST_DIR,
+        collection_metadata=collection_metadata
+    )
+    if reset:
+        logger.info("Dropping Chroma collection %s...", CHROMA_COLLECTION_NAME)
+        vectorstore.delete_collection()
+        vectorstore = Chroma(
+            collection_name=CHROMA_COLLECTION_NAME,
+            embedding_function=embedding,
+            persist_directory=CHROMA_PERSIST_DIR,
+            collection_metadata=collection_metadata
+        )
+    return vectorstore
+
+def _open_postgres(embedding, reset):
+    from langchain_postgres import PGVector
+    from common.postgres_store import get_postgres_engine
+
+    logger.info(f"Using PostgreSQL (PGVector) with connection: {POSTGRES_HOST}")
+    # An ANN index needs a column with fixed dimensions, which PGVector only creates when told the size
+    embedding_length = embedding_dimensions(embedding) if POSTGRES_VECTOR_INDEX != "none" else None
+    return PGVector(
+        connection=get_postgres_engine(), embeddings=embedding, embedding_length=embedding_length,
+        pre_delete_collection=reset
+    )
+
+def _open_elasticsearch(embedding, reset):
+    from langchain_community.vectorstores import ElasticsearchStore
+    from common.elasticsearch_store import get_elasticsearch_client
+
+    logger.info(f"Using Elasticsearch at {ELASTICSEARCH_URL}, index: {ELASTICSEARCH_INDEX}")
+    if reset:
+        reset_elasticsearch_index(embedding_dimensions(embedding))
+    return ElasticsearchStore(
+        index_name=ELASTICSEARCH_INDEX,
+        embedding=embedding,
+        es_connection=get_elasticsearch_client()
+    )
+
+def _open_local(embedding, reset):
+    from common.local_vectorstore import LocalVectorStore
+
+    logger.info("Using the local vector store at %s.", LOCAL_INDEX_DIR)
+    vectorstore = LocalVectorStore(embedding)
+    if reset:
+        vectorstore.reset()
+    return vectorstore
+
+VECTORSTORE_PROVIDERS = {
+    "chroma": _open_chroma,
+    "postgres": _open_postgres,
+    "elasticsearch": _open_elasticsearch,
+    "local": _open_local,
+}
+
+def open_vectorstore(embedding, reset=False):
+    """
+    Opens the configured vector store without adding any documents.
 
     Args:
-        documents (list): The list of documents to be added to the vector store.
+        embedding: The embedding model used by the store.
+        reset (bool): Whether to drop the existing collection/index and start empty.
 
     Returns:
-        The created vector store (Chroma, PGVector, or ElasticVectorSearch).
+        The opened vector store (Chroma, PGVector, ElasticsearchStore, or LocalVectorStore).
 
     Raises:
         ValueError: If an unsupported database type is specified.
     """
-    logger.info("Creating vector store...")
-
-    # Ensure documents are properly chunked
-    logger.info("Chunking documents...")
-    documents = chunk_documents(documents)
-
-    # Get the embedding model
-    embedding = get_embedding_model()
-
-    # Create vector store based on DB_TYPE
-    if DB_TYPE == "chroma":
-        logger.info("Using Chroma as the vector store.")
-        vectorstore = Chroma.from_documents(documents, embedding, collection_name=CHROMA_COLLECTION_NAME)
+    open_store = VECTORSTORE_PROVIDERS.get(DB_TYPE)
+    if open_store is None:
+        logger.error("Unsupported database type: %s", DB_TYPE)
+        raise ValueError("Unsupported database type!")
+    return open_store(embedding, reset)
 
-    elif DB_TYPE == "postgres":
-        logger.info(f"Using PostgreSQL (PGVector) with connection: {POSTGRES_HOST}")
+def iter_source_groups(documents):
+    """
+    Groups a stream of documents into (source, documents) runs of the same 'source' metadata.
+    Loaders yield all documents of a source together, so runs are complete sources.
+    """
+    for source, group in groupby(documents, key=lambda doc: doc.metadata.get("source", UNKNOWN_SOURCE)):
+        yield source, list(group)
+
+class IngestStats:
+    """Per-stage counters and timings of one index sync, logged as throughput."""
+
+    def __init__(self):
+        self.sources = 0
+        self.changed_sources = 0
+        self.documents = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.removed_sources = 0
+        self.load_time = 0.0
+        self.chunk_time = 0.0
+        self.upsert_time = 0.0
+
+    def log(self, prefix="Ingestion progress"):
+        def rate(count, seconds):
+            return count / seconds if seconds else 0.0
+        logger.info(
+            "%s: load %d docs (%.1f docs/s), chunk %d changed sources into %d chunks (%.1f chunks/s), "
+            "embed+upsert %d chunks (%.1f chunks/s).",
+            prefix, self.documents, rate(self.documents, self.load_time),
+            self.changed_sources, self.chunks, rate(self.chunks, self.chunk_time),
+            self.embedded, rate(self.embedded, self.upsert_time)
+        )
 
-        # Set up engine and PGVector store
-        engine = create_engine(POSTGRES_CONNECTION_STRING)
-        vectorstore = PGVector(connection=engine, embeddings=embedding)
+def sync_vectorstore(
+    vectorstore, documents, manifest, batch_size=INGEST_BATCH_SIZE, queue_size=INGEST_QUEUE_SIZE,
+    lexical_index=None, rechunk=False, source_prefix=None
+):
+    """
+    Brings the vector store in line with the given documents using the index manifest.
 
-        # Generate stable unique IDs (use a hash of content or a unique identifier from metadata)
-        ids = [generate_stable_id(doc) for doc in documents]
+    Documents are consumed as a stream: a loader thread reads and chunks one source at a time
+    into a bounded queue, and the calling thread embeds and upserts new chunks in fixed-size
+    batches, so memory use does not grow with the corpus. Only chunks of new or changed sources
+    that are not already stored get embedded, and chunks no longer referenced by any source
+    (changed or deleted) are removed once the stream is exhausted.
 
-        # Check for duplicate IDs and remove them if necessary
-        unique_ids = list(set(ids))  # Remove duplicates by converting to a set
+    Args:
+        vectorstore: The opened vector store.
+        documents (Iterable[Document]): The complete current set of documents, grouped by source.
+        manifest (IndexManifest): The manifest describing what the store already contains.
+        batch_size (int): Number of chunks embedded and upserted per call.
+        queue_size (int): Number of chunked sources buffered ahead of the embedding stage.
+        lexical_index (Optional[BM25Index]): Keyword index kept in step with the vector store
+            under the same chunk IDs.
+        rechunk (bool): Chunk unchanged sources too, e.g. to rebuild the lexical index.
+            Chunks already in the vector store are still not re-embedded.
+        source_prefix (Optional[str]): Only sources whose names start with this prefix are
+            expected in `documents`, e.g. "Mantis - " for a sync of one loader. Other sources
+            in the manifest are left untouched instead of being removed, and nothing is removed
+            if `documents` is empty.
 
-        # **Upsert Logic: Delete existing documents first**
-        vectorstore.delete(unique_ids)
+    Returns:
+        IngestStats: Counters and timings of the sync.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    stats = IngestStats()
+    previous_ids = manifest.chunk_ids()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunk_queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        """Queues an item for the consumer. Returns False once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                chunk_queue.put(item, timeout=_QUEUE_POLL_INTERVAL)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        source_groups = iter_source_groups(documents)
+        try:
+            seen = set()
+            started = time.perf_counter()
+            for source, source_documents in source_groups:
+                stats.load_time += time.perf_counter() - started
+                if source in seen:
+                    logger.warning("Documents of source %s are not contiguous; only the last group is indexed.", source)
+                seen.add(source)
+                stats.sources += 1
+                stats.documents += len(source_documents)
+
+                document_hash = hash_documents(source_documents)
+                unchanged = manifest.source_hash(source) == document_hash
+                if unchanged and not rechunk:
+                    item = (source, document_hash, None)
+                else:
+                    chunk_started = time.perf_counter()
+                    chunks = text_splitter.split_documents(source_documents)
+                    stats.chunk_time += time.perf_counter() - chunk_started
+                    if not unchanged:
+                        stats.changed_sources += 1
+                    stats.chunks += len(chunks)
+                    item = (source, document_hash, chunks)
+                if not put(item):
+                    return
+                started = time.perf_counter()
+            put(_END_OF_STREAM)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Closes the loaders, and their worker pools, also when the consumer stopped early
+            source_groups.close()
+            close = getattr(documents, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="ingest-loader", daemon=True)
+    producer.start()
+
+    seen_sources = set()
+    stored_ids = set(previous_ids)
+    pending = {}
+    pending_sources = []
+    batches = 0
+
+    def flush():
+        nonlocal batches
+        if pending:
+            upsert_started = time.perf_counter()
+            vectorstore.add_documents(list(pending.values()), ids=list(pending))
+            stats.upsert_time += time.perf_counter() - upsert_started
+            stats.embedded += len(pending)
+            stored_ids.update(pending)
+            pending.clear()
+            batches += 1
+            if batches % 10 == 0:
+                stats.log()
+        for source, document_hash, chunk_ids in pending_sources:
+            manifest.set_source(source, document_hash, chunk_ids)
+        pending_sources.clear()
 
-        # Add new documents with metadata
-        # Use the unique_ids for insertion (not the original ids list with duplicates)
-        vectorstore.add_texts(
-            texts=[doc.page_content for doc in documents],
-            metadatas=[doc.metadata for doc in documents],
-            ids=unique_ids,  # Use unique_ids here to avoid conflicts
-            conflict_action='update'  # Ensure no duplicate `id` conflicts
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            source, document_hash, chunks = item
+            seen_sources.add(source)
+            if chunks is None:
+                continue
+
+            chunk_ids = []
+            for chunk in chunks:
+                chunk_id = generate_stable_id(chunk)
+                chunk_ids.append(chunk_id)
+                if chunk_id not in stored_ids:
+                    pending.setdefault(chunk_id, chunk)
+                if lexical_index is not None and chunk_id not in lexical_index:
+                    lexical_index.add(chunk_id, chunk)
+            pending_sources.append((source, document_hash, chunk_ids))
+
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+
+        if source_prefix is not None and not seen_sources:
+            # Loaders return nothing when the remote is unreachable; never prune on that
+            logger.warning("No documents found for sources %r. Keeping their indexed content.", source_prefix)
+            removed_sources = []
+        else:
+            removed_sources = [
+                source for source in manifest.source_names()
+                if source not in seen_sources and (source_prefix is None or source.startswith(source_prefix))
+            ]
+        stats.removed_sources = len(removed_sources)
+        for source in removed_sources:
+            manifest.remove_source(source)
+
+        stale_ids = list(previous_ids - manifest.chunk_ids())
+        if stale_ids:
+            logger.info("Removing %d stale chunks from the vector store...", len(stale_ids))
+            for start in range(0, len(stale_ids), batch_size):
+                vectorstore.delete(ids=stale_ids[start:start + batch_size])
+            if lexical_index is not None:
+                lexical_index.remove_many(stale_ids)
+
+        logger.info(
+            "Index sync: %d sources unchanged, %d new or changed, %d removed.",
+            stats.sources - stats.changed_sources, stats.changed_sources, len(removed_sources)
         )
+        stats.log("Ingestion finished")
+
+        if stats.embedded or stale_ids or removed_sources or manifest.is_fresh:
+            manifest.bump_version()
+        manifest.save()
+        if lexical_index is not None:
+            lexical_index.save(manifest.version)
+    except BaseException:
+        # Keyword index changes are only committed together with the manifest
+        if lexical_index is not None:
+            lexical_index.rollback()
+        raise
+    finally:
+        # Unblocks the loader thread if the sync failed, so it exits instead of leaking
+        stop.set()
+        producer.join()
+
+    return stats
+
+def update_ann_index(vectorstore):
+    """
+    Builds or maintains the approximate nearest neighbour index of the store after a sync:
+    the HNSW graph of the local store, or the HNSW/IVFFlat index of PostgreSQL (POSTGRES_VECTOR_INDEX).
+    """
+    if DB_TYPE == "local":
+        vectorstore.save_index()
+    elif DB_TYPE == "postgres" and POSTGRES_VECTOR_INDEX != "none":
+        from common.postgres_store import ensure_vector_index, get_postgres_engine
+        ensure_vector_index(get_postgres_engine(), embedding_dimensions(vectorstore.embeddings))
 
-        logger.info("Upsert completed for PGVector.")
+def create_vectorstore(documents, embedding=None, rebuild=False):
+    """
+    Creates or incrementally updates a vector store (Chroma, PostgreSQL, Elasticsearch, or the
+    embedded local store) from the documents.
 
+    A manifest in DATA_DIR records a hash per source document and the chunk IDs indexed
+    for it, so only new or changed chunks are embedded and chunks of deleted sources are removed.
+    With USE_HYBRID_SEARCH, the BM25 keyword index is updated from the same chunks.
 
-    elif DB_TYPE == "elasticsearch":
-        logger.info(f"Using Elasticsearch at {ELASTICSEARCH_URL}, index: {ELASTICSEARCH_INDEX}")
-        reset_elasticsearch_index()
+    Args:
+        documents (Iterable[Document]): The complete current set of documents, e.g. the stream
+            returned by `iter_documents()`. All documents of a source must be adjacent.
+        embedding: The embedding model to use, e.g. the one of the store being refreshed.
+            Created from the configuration when omitted.
+        rebuild (bool): Rebuild the store from scratch even if the manifest is still valid.
+            With Elasticsearch and ELASTICSEARCH_BLUE_GREEN, full rebuilds go to a new index
+            that replaces the served one atomically once complete.
 
-        vectorstore = ElasticsearchStore.from_documents(
-            documents,
-            embedding,
-            es_url=ELASTICSEARCH_URL,
-            es_user=ELASTICSEARCH_USERNAME,
-            es_password=ELASTICSEARCH_PASSWORD,                
-            index_name=ELASTICSEARCH_INDEX
-        )
+    Returns:
+        The vector store (Chroma, PGVector, ElasticsearchStore, or LocalVectorStore).
 
-        logger.info("Vector store initialized successfully with Elasticsearch.")
+    Raises:
+        ValueError: If an unsupported database type is specified or no documents were loaded.
+    """
+    logger.info("Creating vector store...")
 
+    # Get the embedding model
+    if embedding is None:
+        embedding = get_embedding_model()
+
+    # A fresh manifest means the store contents are unknown, so start from an empty store.
+    # A missing Chroma or local store directory means the manifest no longer describes the store.
+    manifest = IndexManifest(get_index_signature())
+    reset = (
+        rebuild
+        or manifest.is_fresh
+        or (DB_TYPE == "chroma" and not Path(CHROMA_PERSIST_DIR).exists())
+        or (DB_TYPE == "local" and not Path(LOCAL_INDEX_DIR).exists())
+    )
+    if reset:
+        manifest.reset()
+    blue_green = None
+    if reset and DB_TYPE == "elasticsearch" and ELASTICSEARCH_BLUE_GREEN:
+        from common.elasticsearch_store import BlueGreenIndexBuild
+        blue_green = BlueGreenIndexBuild(embedding, embedding_dimensions(embedding))
+        vectorstore = blue_green.writer
     else:
-        logger.error("Unsupported database type: %s", DB_TYPE)
-        raise ValueError("Unsupported database type!")
+        vectorstore = open_vectorstore(embedding, reset=reset)
+
+    # The keyword index is saved after the manifest; if its version differs (first run with
+    # hybrid search, or a crash in between), rebuild it from freshly chunked sources.
+    lexical_index = get_bm25_index() if USE_HYBRID_SEARCH else None
+    rechunk = False
+    if lexical_index is not None and (reset or lexical_index.version != manifest.version):
+        logger.info("BM25 index is out of date. Rebuilding it from all sources...")
+        lexical_index.clear()
+        rechunk = True
+
+    if blue_green is None:
+        sync_vectorstore(vectorstore, documents, manifest, lexical_index=lexical_index, rechunk=rechunk)
+        update_ann_index(vectorstore)
+    else:
+        try:
+            sync_vectorstore(vectorstore, documents, manifest, lexical_index=lexical_index, rechunk=rechunk)
+            if not manifest.source_names():
+                raise ValueError("No documents available to load.")
+            blue_green.publish()
+        except Exception:
+            # The served index is untouched; forget the manifest written for the new one
+            blue_green.abort()
+            manifest.manifest_file.unlink(missing_ok=True)
+            raise
+        vectorstore = open_vectorstore(embedding, reset=False)
+    if not manifest.source_names():
+        raise ValueError("No documents available to load.")
+
+    if isinstance(embedding, CachedEmbeddings):
+        embedding.log_stats()
 
     logger.info("Vector store created successfully.")
     return vectorstore
+
+def update_vectorstore(documents, source_prefix, embedding=None):
+    """
+    Incrementally syncs the sources of one loader (e.g. Confluence) into an existing index,
+    leaving the sources of all other loaders as they are.
+
+    Args:
+        documents (Iterable[Document]): The complete current documents of the loader, grouped by source.
+        source_prefix (str): The prefix of the loader's source names; stored sources with this
+            prefix that are missing from `documents` are removed.
+        embedding: The embedding model to use. Created from the configuration when omitted.
+
+    Returns:
+        IngestStats: Counters and timings of the sync.
+
+    Raises:
+        ValueError: If there is no index to update yet, or its BM25 index needs a full rebuild.
+    """
+    manifest = IndexManifest(get_index_signature())
+    if manifest.is_fresh:
+        raise ValueError("No index found for the current configuration. A full index build is required.")
+
+    lexical_index = get_bm25_index() if USE_HYBRID_SEARCH else None
+    if lexical_index is not None and lexical_index.version != manifest.version:
+        raise ValueError("BM25 index is out of date with the vector store. A full index build is required.")
+
+    vectorstore = open_vectorstore(embedding if embedding is not None else get_embedding_model(), reset=False)
+    stats = sync_vectorstore(vectorstore, documents, manifest, lexical_index=lexical_index, source_prefix=source_prefix)
+    update_ann_index(vectorstore)
+    return stats
+
+def attach_vectorstore():
+    """
+    Opens the vector store built by a previous ingestion run without loading, chunking,
+    or embedding any documents, so serving processes start in seconds and do not depend
+    on the document sources being reachable.
+
+    Returns:
+        The vector store (Chroma, PGVector, ElasticsearchStore, or LocalVectorStore).
+
+    Raises:
+        ValueError: If no index matching the current configuration has been built yet.
+    """
+    logger.info("Attaching to the existing vector store...")
+
+    manifest = IndexManifest(get_index_signature())
+    if (
+        manifest.is_fresh
+        or not manifest.source_names()
+        or (DB_TYPE == "chroma" and not Path(CHROMA_PERSIST_DIR).exists())
+        or (DB_TYPE == "local" and not Path(LOCAL_INDEX_DIR).exists())
+    ):
+        raise ValueError("No index found for the current configuration. Run `python ingest.py` first.")
+
+    if USE_HYBRID_SEARCH and get_bm25_index().version != manifest.version:
+        logger.warning("BM25 index is out of date with the vector store. Run `python ingest.py` to rebuild it.")
+
+    vectorstore = open_vectorstore(get_embedding_model(), reset=False)
+    logger.info("Attached to index version %d with %d sources.", manifest.version, len(manifest.source_names()))
+    return vectorstore
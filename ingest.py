@@ -0,0 +1,56 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any settings are read
+load_dotenv()
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from common.config import DATA_DIR
+from common.document_loader import iter_documents
+from common.vectorstore import create_vectorstore
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build or update the document index.")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the index from scratch instead of syncing it incrementally. With Elasticsearch, "
+             "the new index replaces the served one atomically once complete (ELASTICSEARCH_BLUE_GREEN)."
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """
+    Builds or incrementally updates the vector store (and BM25 index) from all configured
+    document sources. Run it offline, e.g. from cron or a CI job, and serve with
+    INDEX_MODE=attach so the API only opens the resulting index.
+
+    Returns:
+        int: The process exit code.
+    """
+    args = parse_args()
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    started = time.perf_counter()
+    try:
+        create_vectorstore(iter_documents(), rebuild=args.rebuild)
+    except Exception as e:
+        logger.error(f"Ingestion failed: {e}")
+        return 1
+
+    logger.info("Ingestion finished in %.1fs.", time.perf_counter() - started)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,20 +3,27 @@ import logging
 
 from common import chain_singleton
 from common.chat_history_manager import ChatHistoryManager
-from common.document_loader import load_documents
-from common.vectorstore import create_vectorstore
-from common.config import DATA_DIR
+from common.conversation_history import ConversationHistory
+from common.vectorstore import attach_vectorstore, create_vectorstore
+from common.config import DATA_DIR, INDEX_MODE
+from common.index_refresher import IndexRefresher
 from common.llm_chooser import get_llm
+from common.startup_profile import startup_phase
 
 logger = logging.getLogger(__name__)
 
 # Global objects to be initialized at startup
 chat_manager = ChatHistoryManager()
+conversation = ConversationHistory(chat_manager)
+index_refresher = IndexRefresher()
 
 
 def initialize_resources() -> bool:
     """
     Initialize and load resources including documents, vector store, LLM, and processing chain.
+
+    With INDEX_MODE=attach, the index built by `ingest.py` is opened as-is instead of
+    loading and syncing all document sources.
     
     Returns:
         bool: True if initialization is successful, False otherwise.
@@ -31,22 +38,26 @@ def initialize_resources() -> bool:
         logger.error(f"Error creating data directory '{DATA_DIR}': {e}")
         return False
 
-    # Load documents and create vector store
+    # Attach to the prebuilt index, or stream documents into the vector store
     try:
-        documents = load_documents()
-        if not documents:
-            logger.error("No documents available to load.")
-            return False
-        
-        vector_db = create_vectorstore(documents)
-        logger.info("Vector store created successfully.")
+        with startup_phase("Vector store"):
+            if INDEX_MODE == "attach":
+                vector_db = attach_vectorstore()
+            else:
+                # Document loaders are only needed when building the index
+                from common.document_loader import iter_documents
+                vector_db = create_vectorstore(iter_documents())
+        logger.info("Vector store is ready.")
     except Exception as e:
         logger.error(f"Error initializing vector store: {e}")
         return False
 
     # Initialize LLM
     try:
-        llm = get_llm()
+        with startup_phase("LLM"):
+            llm = get_llm()
+        conversation.llm = llm
+        index_refresher.llm = llm
         logger.info("LLM initialized successfully.")
     except Exception as e:
         logger.error(f"Error initializing LLM: {e}")
@@ -54,10 +65,14 @@ def initialize_resources() -> bool:
 
     # Create chain
     try:
-        chain = chain_singleton.ChainSingleton().initialize_chain(vector_db, llm)
-       
+        with startup_phase("Chain"):
+            chain = chain_singleton.ChainSingleton().initialize_chain(vector_db, llm)
     except Exception as e:
         logger.error(f"Error creating processing chain: {e}")
         return False
 
+    # Pick up changed files in DATA_DIR and remote sources without a restart
+    if index_refresher.has_schedule:
+        index_refresher.start()
+
     return True
\ No newline at end of file